@@ -1,8 +1,13 @@
 def __getattr__(name: str):
-    if name == "assemble":
-        global assemble
-        from .assembler import assemble
+    if name in ("assemble", "assemble_words", "format_words"):
+        from . import assembler
 
-        return assemble
-    raise AttributeError(f"Module {__name__} does not export name {name!r}")
+        value = getattr(assembler, name)
+        globals()[name] = value
+        return value
+    if name == "disassemble":
+        from .disassembler import disassemble
 
+        globals()[name] = disassemble
+        return disassemble
+    raise AttributeError(f"Module {__name__} does not export name {name!r}")
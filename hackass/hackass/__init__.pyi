@@ -1,2 +1,2 @@
-from .assembler import assemble
-
+from .assembler import assemble, assemble_words, format_words
+from .disassembler import disassemble
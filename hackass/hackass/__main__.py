@@ -1,5 +1,4 @@
 if __name__ == "__main__":
     from .main import main
 
-    main()
-
+    raise SystemExit(main())
@@ -1,17 +1,65 @@
+import sys
+import typing
+from array import array
 from collections import defaultdict
 
-from .codes import PREDEFINED, USR_SYM_START
+from .codes import C_INST, COMP_BITS, DEST_BITS, JUMP_BITS, PREDEFINED, USR_SYM_START
 from .lexer import Lexer, Token
+from .lineparser import LineParser
 from .parser import Parser
+from .rom import header
 from .utils import AInstruction, CInstruction
 
+if typing.TYPE_CHECKING:
+    from .cfg import Stats
 
-def assemble(
-    program: str, /, symbols: dict[str, int] = PREDEFINED, sym_cnt_start: int = USR_SYM_START
-) -> str:
-    lexer = Lexer(program)
-    parser = Parser(lexer)
-    inst_codes: list[str] = []
+
+def make_parser(program: str, fast: bool = False) -> Parser | LineParser:
+    if fast:
+        return LineParser(program.split("\n"))
+    return Parser(Lexer(program))
+
+
+def assemble_words(
+    program: str,
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    fast: bool = False,
+    optimize: bool = False,
+    stats: "Stats | None" = None,
+    labels: dict[str, int] | None = None,
+) -> array:
+    """
+    Assemble `program` into an array('H') of 16bit instruction words.
+
+    fast selects the line-at-a-time LineParser front end instead of the char Lexer.
+    optimize threads jumps, drops unreachable blocks and runs the peephole
+    passes over the parsed program before encoding; stats collects what that did.
+    labels, when given, is filled with the address of every label.
+    """
+    parser = make_parser(program, fast)
+    if optimize or stats is not None:
+        from .cfg import CFG, simplify
+        from .linker import encode_unit, link
+        from .peephole import optimize as peephole
+
+        insts = list(iter(parser.parse, None))
+        if stats is not None:
+            stats.words_in = CFG(insts).size()
+        if optimize:
+            insts = peephole(simplify(insts, stats), symbols)
+        elif stats is not None:
+            stats.blocks = len(CFG(insts).blocks)
+        unit = encode_unit(insts, symbols)
+        words = link([unit], sym_cnt_start)
+        if labels is not None:
+            labels.update(unit.labels)
+        if stats is not None:
+            stats.words_out = len(words)
+        return words
+    words = array("H")
     resolve = defaultdict(list[int])
     while True:
         match parser.parse():
@@ -22,34 +70,131 @@ def assemble(
                     raise Exception("Line", line, ":Symbol redeclared:", symbol)
             case AInstruction(value=Token(typ=Token.Type.INT, lexeme=lexeme)):
                 assert len(lexeme) == 15, "len(Token.Type.INT) != 15"
-                inst_codes.append("0" + lexeme)
+                words.append(int(lexeme, 2))
             case AInstruction(value=Token(typ=Token.Type.ID, lexeme=symbol, line=line)):
                 if symbol in symbols:
-                    value = format(symbols[symbol], "b").rjust(16, "0")
-                    inst_codes.append(value)
+                    words.append(symbols[symbol])
                 elif symbol in parser.labels:
-                    value = format(parser.labels[symbol], "b").rjust(16, "0")
-                    inst_codes.append(value)
+                    words.append(parser.labels[symbol])
                 else:
-                    resolve[symbol].append(len(inst_codes))
-                    inst_codes.append("0")
+                    resolve[symbol].append(len(words))
+                    words.append(0)
             case CInstruction(dest=dest, comp=comp, jump=jump):
-                inst_codes.append(f"111{comp:s}{dest:s}{jump:s}")
+                words.append(C_INST | COMP_BITS[comp] | DEST_BITS[dest] | JUMP_BITS[jump])
             case None:
                 break
     for symbol, where in resolve.items():
         if symbol in parser.labels:
-            value = format(parser.labels[symbol], "b").rjust(16, "0")
+            value = parser.labels[symbol]
         else:
-            v = sym_cnt_start
+            value = sym_cnt_start
             sym_cnt_start += 1
-            value = format(v, "b").rjust(16, "0")
         for here in where:
-            inst_codes[here] = value
+            words[here] = value
+    if labels is not None:
+        labels.update(parser.labels)
+    return words
+
+
+def format_words(words: typing.Iterable[int]) -> str:
+    "Render instruction words in the textual .hack format."
+    return "\n".join(map("{:016b}".format, words)) + "\n"
 
-    def check_inst(c: str) -> str:
-        assert len(c) == 16, (c, len(c))
-        return c
 
-    return "\n".join(map(check_inst, inst_codes)) + "\n"
+def assemble(
+    program: str,
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    fast: bool = False,
+    optimize: bool = False,
+) -> str:
+    return format_words(
+        assemble_words(program, symbols, sym_cnt_start, fast=fast, optimize=optimize)
+    )
+
+
+def _encode_text(words: array) -> bytes:
+    return "".join(map("{:016b}\n".format, words)).encode("ascii")
+
 
+def _encode_binary(words: array) -> bytes:
+    if sys.byteorder != "little":
+        words = array("H", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def assemble_stream(
+    lines: typing.Iterable[str],
+    out: typing.BinaryIO,
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    binary: bool = False,
+    buffer_size: int = 4096,
+) -> int:
+    """
+    Assemble `lines` (any iterable of lines, e.g. an open file) into the
+    seekable file `out` as they are parsed, in .hack text or binary ROM format.
+
+    Only forward references are held in memory: they are written as 0 and
+    backpatched at their fixed offsets once every label is known.
+    Returns the number of instruction words written.
+    """
+    parser = LineParser(lines)
+    encode, width = (_encode_binary, 2) if binary else (_encode_text, 17)
+    start = out.tell()
+    if binary:
+        out.write(header(0))
+    base = out.tell()
+    count = 0
+    buffer = array("H")
+    resolve: defaultdict[str, array] = defaultdict(lambda: array("I"))
+    while True:
+        match parser.parse():
+            case AInstruction(
+                value=Token(typ=Token.Type.LABEL, lexeme=symbol, line=line)
+            ):
+                if symbol in symbols:
+                    raise Exception("Line", line, ":Symbol redeclared:", symbol)
+                continue
+            case AInstruction(value=Token(typ=Token.Type.INT, lexeme=lexeme)):
+                buffer.append(int(lexeme, 2))
+            case AInstruction(value=Token(typ=Token.Type.ID, lexeme=symbol)):
+                if symbol in symbols:
+                    buffer.append(symbols[symbol])
+                elif symbol in parser.labels:
+                    buffer.append(parser.labels[symbol])
+                else:
+                    resolve[symbol].append(count)
+                    buffer.append(0)
+            case CInstruction(dest=dest, comp=comp, jump=jump):
+                buffer.append(C_INST | COMP_BITS[comp] | DEST_BITS[dest] | JUMP_BITS[jump])
+            case None:
+                break
+        count += 1
+        if len(buffer) >= buffer_size:
+            out.write(encode(buffer))
+            del buffer[:]
+    out.write(encode(buffer))
+    if not binary and count == 0:
+        out.write(b"\n")
+    end = out.tell()
+    for symbol, where in resolve.items():
+        if symbol in parser.labels:
+            value = parser.labels[symbol]
+        else:
+            value = sym_cnt_start
+            sym_cnt_start += 1
+        patch = encode(array("H", (value,)))
+        for here in where:
+            out.seek(base + here * width)
+            out.write(patch)
+    if binary:
+        out.seek(start)
+        out.write(header(count))
+    out.seek(end)
+    return count
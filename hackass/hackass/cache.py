@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import os
+import pathlib
+import tempfile
+import time
+
+from .codes import PREDEFINED, USR_SYM_START
+
+CACHE_ENV = "HACKASS_CACHE_DIR"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+TMP_PREFIX = ".tmp-"
+# Temporary files older than this were left by a writer that died.
+STALE_TMP_SECONDS = 3600
+
+
+@functools.cache
+def assembler_digest() -> str:
+    """
+    Hash of hackass's own source files, so editing the assembler, installed
+    editable or not at all, invalidates what it assembled before.
+    """
+    h = hashlib.sha256()
+    for path in sorted(pathlib.Path(__file__).parent.glob("*.py")):
+        h.update(path.name.encode())
+        h.update(b"\0")
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def default_root() -> pathlib.Path:
+    if root := os.getenv(CACHE_ENV):
+        return pathlib.Path(root)
+    base = os.getenv("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / "hackass"
+
+
+class Cache:
+    """
+    Assembled outputs on disk, keyed by a hash of the source and everything
+    that affects how it assembles. Least recently used entries are evicted
+    once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, root: pathlib.Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = default_root() if root is None else root
+        self.max_bytes = max_bytes
+        self.version = assembler_digest()
+
+    def key(
+        self,
+        source: bytes,
+        symbols: dict[str, int] = PREDEFINED,
+        sym_cnt_start: int = USR_SYM_START,
+        **options: object,
+    ) -> str:
+        h = hashlib.sha256()
+        h.update(self.version.encode())
+        h.update(repr(sorted(symbols.items())).encode())
+        h.update(repr(sym_cnt_start).encode())
+        h.update(repr(sorted(options.items())).encode())
+        h.update(b"\0")
+        h.update(source)
+        return h.hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.root / key
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted by a concurrent run since, the data is still good
+        return data
+
+    def put(self, key: str, data: bytes):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        total = 0
+        stale = time.time() - STALE_TMP_SECONDS
+        for path in self.root.iterdir():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.name.startswith(TMP_PREFIX):
+                # Other runs may still be writing the recent ones.
+                if st.st_mtime < stale:
+                    path.unlink(missing_ok=True)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,191 @@
+import dataclasses as dt
+import typing
+
+from .codes import DestCodes, JumpCodes
+from .lexer import Token
+from .peephole import a_is_dead, uses_a
+from .utils import AInstruction, CInstruction, Instruction
+
+ROM_SIZE = 0x8000
+
+
+@dt.dataclass(slots=True)
+class Block:
+    "Straight-line run of instructions, entered at the top and left at the bottom."
+
+    labels: list[Token] = dt.field(default_factory=list)
+    insts: list[Instruction] = dt.field(default_factory=list)
+
+    def falls_through(self) -> bool:
+        last = self.insts[-1] if self.insts else None
+        return not (isinstance(last, CInstruction) and last.jump is JumpCodes.JMP)
+
+    def refs(self) -> typing.Iterator[str]:
+        "Every symbol loaded into A, jump targets and taken addresses alike."
+        for inst in self.insts:
+            if isinstance(inst, AInstruction) and inst.value.typ == Token.Type.ID:
+                yield inst.value.lexeme
+
+    def trampoline(self) -> str | None:
+        "Target of a block that does nothing but `@T / 0;JMP`."
+        match self.insts:
+            case [
+                AInstruction(value=Token(typ=Token.Type.ID, lexeme=target)),
+                CInstruction(dest=DestCodes.NULL, jump=JumpCodes.JMP),
+            ]:
+                return target
+        return None
+
+    def size(self) -> int:
+        return len(self.insts)
+
+
+class CFG:
+    def __init__(self, insts: typing.Iterable[Instruction]):
+        self.blocks: list[Block] = [Block()]
+        self.labels: dict[str, int] = {}
+        for inst in insts:
+            block = self.blocks[-1]
+            if isinstance(inst, AInstruction) and inst.value.typ == Token.Type.LABEL:
+                if block.insts:
+                    block = Block()
+                    self.blocks.append(block)
+                block.labels.append(inst.value)
+                self.labels[inst.value.lexeme] = len(self.blocks) - 1
+                continue
+            block.insts.append(inst)
+            if isinstance(inst, CInstruction) and inst.jump is not JumpCodes.NULL:
+                self.blocks.append(Block())
+        if len(self.blocks) > 1 and not self.blocks[-1].labels and not self.blocks[-1].insts:
+            self.blocks.pop()
+
+    def successors(self, index: int) -> typing.Iterator[int]:
+        """
+        Blocks control may reach from `index`: the fall through block and any
+        block whose label is loaded into A, since that is how Hack jumps and
+        how return addresses are taken.
+        """
+        block = self.blocks[index]
+        if block.falls_through() and index + 1 < len(self.blocks):
+            yield index + 1
+        for symbol in block.refs():
+            if (target := self.labels.get(symbol)) is not None:
+                yield target
+
+    def reachable(self) -> list[bool]:
+        seen = [False] * len(self.blocks)
+        work = [0]
+        while work:
+            index = work.pop()
+            if seen[index]:
+                continue
+            seen[index] = True
+            work.extend(self.successors(index))
+        return seen
+
+    def final_target(self, label: str) -> str:
+        "Follow `label` through trampoline blocks to where control really goes."
+        seen = {label}
+        while (index := self.labels.get(label)) is not None:
+            target = self.blocks[index].trampoline()
+            if target is None or target in seen:
+                break
+            seen.add(target)
+            label = target
+        return label
+
+    def thread_jumps(self) -> int:
+        """
+        Retarget `@L / jump` at whatever trampolines starting at L lead to.
+        Jumps that also compute with A or write RAM[A] are left alone. A
+        conditional jump leaves A holding L on the fall through path, so
+        it is only retargeted when the code there overwrites A before use.
+        """
+        threaded = 0
+        for index, block in enumerate(self.blocks):
+            insts = block.insts
+            following = self.blocks[index + 1].insts if index + 1 < len(self.blocks) else []
+            for i in range(len(insts) - 1):
+                match insts[i], insts[i + 1]:
+                    case (
+                        AInstruction(value=Token(typ=Token.Type.ID, lexeme=label) as tk),
+                        CInstruction(dest=dest, jump=jump) as inst,
+                    ) if jump is not JumpCodes.NULL and label in self.labels:
+                        if uses_a(inst):
+                            continue
+                        if (
+                            jump is not JumpCodes.JMP
+                            and "A" not in dest.name
+                            and not a_is_dead(following, 0)
+                        ):
+                            continue
+                        target = self.final_target(label)
+                        if target != label:
+                            insts[i] = AInstruction(dt.replace(tk, lexeme=target))
+                            threaded += 1
+        return threaded
+
+    def remove_unreachable(self) -> tuple[int, int]:
+        "Drop blocks control cannot reach, returns the blocks and words removed."
+        keep = self.reachable()
+        removed = [block for block, live in zip(self.blocks, keep) if not live]
+        self.blocks = [block for block, live in zip(self.blocks, keep) if live]
+        self.labels = {
+            label.lexeme: index
+            for index, block in enumerate(self.blocks)
+            for label in block.labels
+        }
+        return len(removed), sum(block.size() for block in removed)
+
+    def instructions(self) -> typing.Iterator[Instruction]:
+        for block in self.blocks:
+            for label in block.labels:
+                yield AInstruction(label)
+            yield from block.insts
+
+    def size(self) -> int:
+        return sum(block.size() for block in self.blocks)
+
+
+@dt.dataclass(slots=True)
+class Stats:
+    blocks: int = 0
+    threaded_jumps: int = 0
+    unreachable_blocks: int = 0
+    unreachable_words: int = 0
+    words_in: int = 0
+    words_out: int = 0
+
+    def report(self) -> str:
+        return "\n".join(
+            (
+                f"blocks:             {self.blocks}",
+                f"threaded jumps:     {self.threaded_jumps}",
+                f"unreachable blocks: {self.unreachable_blocks}"
+                f" ({self.unreachable_words} words)",
+                f"words:              {self.words_in} -> {self.words_out}"
+                f" ({self.words_in - self.words_out} removed)",
+                f"ROM headroom:       {ROM_SIZE - self.words_out} words"
+                f" ({100 * self.words_out / ROM_SIZE:.1f}% used)",
+            )
+        )
+
+
+def simplify(
+    insts: typing.Iterable[Instruction], stats: Stats | None = None
+) -> list[Instruction]:
+    """
+    Thread jumps through trampolines then drop unreachable blocks.
+
+    Code is moved around, so this assumes control only ever reaches a label
+    and never a literal ROM address.
+    """
+    cfg = CFG(insts)
+    threaded = cfg.thread_jumps()
+    blocks, words = cfg.remove_unreachable()
+    if stats is not None:
+        stats.blocks = len(cfg.blocks) + blocks
+        stats.threaded_jumps += threaded
+        stats.unreachable_blocks += blocks
+        stats.unreachable_words += words
+    return list(cfg.instructions())
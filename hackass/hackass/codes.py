@@ -76,3 +76,51 @@ class DestCodes(enum.StrEnum):
     AD = "110"
     ADM = "111"
 
+
+
+# Source spellings accepted for each code, a C-instruction is written as
+# dest=comp;jump with the dest= and ;jump parts omitted when NULL.
+COMP_MNEMONICS: dict[CompCodes, str] = {
+    CompCodes.ZERO: "0",
+    CompCodes.ONE: "1",
+    CompCodes.NEG_ONE: "-1",
+    CompCodes.D: "D",
+    CompCodes.A: "A",
+    CompCodes.M: "M",
+    CompCodes.NOT_D: "!D",
+    CompCodes.NOT_A: "!A",
+    CompCodes.NOT_M: "!M",
+    CompCodes.NEG_D: "-D",
+    CompCodes.NEG_A: "-A",
+    CompCodes.NEG_M: "-M",
+    CompCodes.DpONE: "D+1",
+    CompCodes.ApONE: "A+1",
+    CompCodes.MpONE: "M+1",
+    CompCodes.DmONE: "D-1",
+    CompCodes.AmONE: "A-1",
+    CompCodes.MmONE: "M-1",
+    CompCodes.DpA: "D+A",
+    CompCodes.DpM: "D+M",
+    CompCodes.DmA: "D-A",
+    CompCodes.DmM: "D-M",
+    CompCodes.AmD: "A-D",
+    CompCodes.MmD: "M-D",
+    CompCodes.DaA: "D&A",
+    CompCodes.DaM: "D&M",
+    CompCodes.DoA: "D|A",
+    CompCodes.DoM: "D|M",
+}
+DEST_MNEMONICS: dict[DestCodes, str] = {
+    code: "" if code is DestCodes.NULL else code.name for code in DestCodes
+}
+JUMP_MNEMONICS: dict[JumpCodes, str] = {
+    code: "" if code is JumpCodes.NULL else code.name for code in JumpCodes
+}
+
+
+# Integer forms of the tables above, pre-shifted into place so a C-instruction
+# word is just C_INST | COMP_BITS[comp] | DEST_BITS[dest] | JUMP_BITS[jump].
+C_INST: int = 0b111 << 13
+COMP_BITS: dict[CompCodes, int] = {code: int(code, 2) << 6 for code in CompCodes}
+DEST_BITS: dict[DestCodes, int] = {code: int(code, 2) << 3 for code in DestCodes}
+JUMP_BITS: dict[JumpCodes, int] = {code: int(code, 2) for code in JumpCodes}
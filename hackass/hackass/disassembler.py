@@ -0,0 +1,48 @@
+import functools
+import typing
+from array import array
+
+from .codes import (
+    COMP_MNEMONICS,
+    DEST_MNEMONICS,
+    JUMP_MNEMONICS,
+    CompCodes,
+    DestCodes,
+    JumpCodes,
+)
+
+
+@functools.cache
+def decode_table() -> tuple[str, ...]:
+    """
+    Source text for every possible 16bit word, so decoding a ROM is a single
+    lookup per word. Words that are not valid instructions become comments.
+    """
+    table = [f"// .word 0x{word:04x}" for word in range(0x10000)]
+    table[:0x8000] = map("@{}".format, range(0x8000))
+    for comp in CompCodes:
+        c = COMP_MNEMONICS[comp]
+        for dest in DestCodes:
+            d = DEST_MNEMONICS[dest]
+            src = f"{d}={c}" if d else c
+            for jump in JumpCodes:
+                j = JUMP_MNEMONICS[jump]
+                word = 0b111 << 13 | int(comp, 2) << 6 | int(dest, 2) << 3 | int(jump, 2)
+                table[word] = f"{src};{j}" if j else src
+    return tuple(table)
+
+
+def disassemble_words(words: typing.Iterable[int]) -> list[str]:
+    return list(map(decode_table().__getitem__, words))
+
+
+def disassemble(rom: bytes | str | array | memoryview) -> str:
+    "Turn a binary ROM image, .hack listing or array of words back into assembly."
+    if isinstance(rom, str):
+        rom = rom.encode()
+    if isinstance(rom, bytes):
+        from .rom import loads
+
+        rom = loads(rom)
+    lines = disassemble_words(rom)
+    return "\n".join(lines) + "\n" if lines else ""
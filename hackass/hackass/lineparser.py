@@ -0,0 +1,110 @@
+import re
+import typing
+
+from .codes import (
+    COMP_MNEMONICS,
+    DEST_MNEMONICS,
+    JUMP_MNEMONICS,
+    CompCodes,
+    DestCodes,
+    JumpCodes,
+)
+from .lexer import Lexer, Token
+from .parser import Parser
+from .utils import AInstruction, CInstruction
+
+
+def _c_instructions() -> dict[str, CInstruction]:
+    table: dict[str, CInstruction] = {}
+    for dest in DestCodes:
+        d = DEST_MNEMONICS[dest]
+        for comp in CompCodes:
+            c = COMP_MNEMONICS[comp]
+            for jump in JumpCodes:
+                j = JUMP_MNEMONICS[jump]
+                src = f"{d}={c}" if d else c
+                table[f"{src};{j}" if j else src] = CInstruction(dest, comp, jump)
+    return table
+
+
+# Every legal dest=comp;jump spelling, whitespace free.
+C_INSTRUCTIONS: dict[str, CInstruction] = _c_instructions()
+
+_ID = re.compile(r"[A-Za-z_.$:][A-Za-z0-9_.$:]*")
+
+
+class LineParser:
+    """
+    Drop-in replacement for Parser that works a whole line at a time.
+
+    Lines are matched against C_INSTRUCTIONS and simple A-instruction and
+    label patterns. A line the tables do not cover is handed to the char
+    Lexer/Parser, which either reports the error or parses the odd spelling.
+    """
+
+    def __init__(self, lines: typing.Iterable[str], first_line: int = 1):
+        self.lines = iter(lines)
+        self.line = first_line - 1
+        self.count = 0
+        self.labels: dict[str, int] = {}
+
+    reset = __init__
+
+    def fallback(self, text: str) -> AInstruction | CInstruction | None:
+        lexer = Lexer(text)
+        lexer.line = self.line
+        lexer.labels = set(self.labels)
+        parser = Parser(lexer)
+        parser.count = self.count
+        parser.labels = self.labels
+        inst = parser.parse()
+        self.count = parser.count
+        return inst
+
+    def label(self, name: str):
+        if name in self.labels:
+            raise Exception("Line", self.line, ":Label redeclared:", name)
+        if self.count >= 0x8000:
+            raise Exception(
+                "Line", self.line, ":Label value cannot fit into 15bits:", self.count
+            )
+        self.labels[name] = self.count
+        return AInstruction(Token(name, Token.Type.LABEL, self.line))
+
+    def parse_line(self, text: str) -> AInstruction | CInstruction | None:
+        code = text.partition("//")[0].strip(" \t\n")
+        if not code or "/" in code:
+            return self.fallback(text) if code else None
+        if inst := C_INSTRUCTIONS.get(code):
+            self.count += 1
+            return inst
+        match code[0]:
+            case "@":
+                value = code[1:]
+                if value.isascii() and value.isdigit():
+                    number = int(value)
+                    if number <= 0x7FFF:
+                        self.count += 1
+                        token = Token(format(number, "015b"), Token.Type.INT, self.line)
+                        return AInstruction(token)
+                elif _ID.fullmatch(value):
+                    self.count += 1
+                    return AInstruction(Token(value, Token.Type.ID, self.line))
+            case "(":
+                if code[-1] == ")" and _ID.fullmatch(code, 1, len(code) - 1):
+                    return self.label(code[1:-1])
+            case _:
+                squeezed = code.replace(" ", "").replace("\t", "")
+                inst = C_INSTRUCTIONS.get(squeezed)
+                # Whitespace may separate any C-instruction tokens except
+                # the letters of a jump spec.
+                if inst and JUMP_MNEMONICS[inst.jump] in code:
+                    self.count += 1
+                    return inst
+        return self.fallback(text)
+
+    def parse(self) -> AInstruction | CInstruction | None:
+        for text in self.lines:
+            self.line += 1
+            if inst := self.parse_line(text):
+                return inst
@@ -0,0 +1,125 @@
+import dataclasses as dt
+import typing
+from array import array
+
+from .codes import C_INST, COMP_BITS, DEST_BITS, JUMP_BITS, PREDEFINED, USR_SYM_START
+from .lexer import Token
+from .lineparser import LineParser
+from .utils import AInstruction, CInstruction, Instruction
+
+
+@dt.dataclass(slots=True)
+class Unit:
+    """
+    A relocatable piece of a program.
+
+    Every reference to a label or variable is left as 0 in `words` and listed
+    in `refs` in order of first reference; `labels` holds offsets into `words`.
+    Linked with local_labels, a unit's own labels are local to it unless
+    another unit references them, see link.
+    """
+
+    words: array = dt.field(default_factory=lambda: array("H"))
+    labels: dict[str, int] = dt.field(default_factory=dict)
+    refs: dict[str, array] = dt.field(default_factory=dict)
+
+    def define(self, label: str, symbols: dict[str, int], line: int | None = None):
+        "Put `label` at the next word."
+        if label in symbols or label in self.labels:
+            if line is None:
+                raise Exception("Symbol redeclared:", label)
+            raise Exception("Line", line, ":Symbol redeclared:", label)
+        self.labels[label] = len(self.words)
+
+    def load(self, symbol: str, symbols: dict[str, int]):
+        "Append `@symbol`, left for link to patch unless `symbols` has it."
+        words = self.words
+        if symbol in symbols:
+            words.append(symbols[symbol])
+            return
+        if (where := self.refs.get(symbol)) is None:
+            where = self.refs[symbol] = array("I")
+        where.append(len(words))
+        words.append(0)
+
+
+def encode_unit(
+    instructions: typing.Iterable[Instruction], /, symbols: dict[str, int] = PREDEFINED
+) -> Unit:
+    "Encode a parsed instruction stream, label definitions included, into a Unit."
+    unit = Unit()
+    words, define, load = unit.words, unit.define, unit.load
+    for inst in instructions:
+        match inst:
+            case AInstruction(
+                value=Token(typ=Token.Type.LABEL, lexeme=symbol, line=line)
+            ):
+                define(symbol, symbols, line)
+            case AInstruction(value=Token(typ=Token.Type.INT, lexeme=lexeme)):
+                words.append(int(lexeme, 2))
+            case AInstruction(value=Token(typ=Token.Type.ID, lexeme=symbol)):
+                load(symbol, symbols)
+            case CInstruction(dest=dest, comp=comp, jump=jump):
+                words.append(C_INST | COMP_BITS[comp] | DEST_BITS[dest] | JUMP_BITS[jump])
+    return unit
+
+
+def assemble_unit(
+    lines: typing.Iterable[str],
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    first_line: int = 1,
+) -> Unit:
+    parser = LineParser(lines, first_line)
+    return encode_unit(iter(parser.parse, None), symbols)
+
+
+def link(
+    units: typing.Iterable[Unit],
+    /,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    local_labels: bool = False,
+) -> array:
+    """
+    Lay `units` out one after the other and patch every reference.
+
+    Labels are global and defined once, as when assembling the units'
+    concatenation. With `local_labels`, as hlink links separately written
+    units, a reference to a label the unit defines itself resolves to that
+    label, so units may each have their own (LOOP); any other reference
+    goes to the one unit defining the label, and defining it in several is
+    an error only then. Variables, symbols no unit defines, are numbered
+    from `sym_cnt_start` in order of first reference across the units, the
+    same order assembling their concatenation gives.
+    """
+    units = list(units)
+    words = array("H")
+    definitions: dict[str, list[int]] = {}
+    bases: list[int] = []
+    for unit in units:
+        base = len(words)
+        for label, offset in unit.labels.items():
+            if base + offset >= 0x8000:
+                raise Exception("Label value cannot fit into 15bits:", label, base + offset)
+            if label in definitions and not local_labels:
+                raise Exception("Label redeclared:", label)
+            definitions.setdefault(label, []).append(base + offset)
+        bases.append(base)
+        words.extend(unit.words)
+    variables: dict[str, int] = {}
+    for base, unit in zip(bases, units):
+        for symbol, where in unit.refs.items():
+            if (offset := unit.labels.get(symbol)) is not None:
+                value = base + offset
+            elif (found := definitions.get(symbol)) is None:
+                if (value := variables.get(symbol)) is None:
+                    value = variables[symbol] = sym_cnt_start
+                    sym_cnt_start += 1
+            elif len(found) > 1:
+                raise Exception("Label redeclared:", symbol)
+            else:
+                value = found[0]
+            for here in where:
+                words[base + here] = value
+    return words
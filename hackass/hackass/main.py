@@ -1,31 +1,385 @@
+import argparse
+import glob
+import os
 import pathlib
 import sys
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 
+if typing.TYPE_CHECKING:
+    from .cache import Cache
+    from .cfg import Stats
 
-def compile(input_file: pathlib.Path, output_file: pathlib.Path):
-    from .assembler import assemble
+TEXT_SUFFIX = ".hack"
+BINARY_SUFFIX = ".rom"
+
+
+def write_words(words: array, output_file: pathlib.Path, binary: bool = False):
+    if binary:
+        from . import rom
+
+        with open(output_file, "wb") as f:
+            rom.dump(words, f)
+    else:
+        from .assembler import format_words
+
+        with open(output_file, "w") as f:
+            f.write(format_words(words))
+
+
+def compile_object(input_file: pathlib.Path, output_file: pathlib.Path):
+    from . import objfile
+    from .linker import assemble_unit
 
+    with open(input_file) as f:
+        unit = assemble_unit(f)
+    with open(output_file, "wb") as f:
+        objfile.dump(unit, f)
+    return unit
+
+
+def compile(
+    input_file: pathlib.Path,
+    output_file: pathlib.Path,
+    binary: bool = False,
+    fast: bool = False,
+    stream: bool = False,
+    workers: int = 0,
+    optimize: bool = False,
+    stats: bool = False,
+) -> "Stats | None":
+    "Assemble `input_file`, returning the optimizer's report when `stats`."
+    from .assembler import assemble_stream, assemble_words
+
+    if stream:
+        with open(input_file) as src, open(output_file, "wb") as out:
+            assemble_stream(src, out, binary=binary)
+        return None
     with open(input_file) as f:
         prog = f.read()
-    code = assemble(prog)
-    with open(output_file, "w") as f:
-        f.write(code)
+    report = None
+    if workers:
+        from .parallel import assemble_words_parallel
 
+        words = assemble_words_parallel(prog, workers=workers)
+    else:
+        from .cfg import Stats
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python -m hackass program.asm\n  -> program.hack", file=sys.stderr)
-        return 1
-    input_file = pathlib.Path(sys.argv[1])
+        report = Stats() if stats else None
+        words = assemble_words(prog, fast=fast, optimize=optimize, stats=report)
+        if report is not None:
+            print(report.report(), file=sys.stderr)
+    write_words(words, output_file, binary)
+    return report
+
+
+def compile_cached(
+    cache: "Cache",
+    input_file: pathlib.Path,
+    output_file: pathlib.Path,
+    binary: bool = False,
+    *args,
+    optimize: bool = False,
+    stats: bool = False,
+    **kwargs,
+):
+    """
+    compile() through `cache`, a hit is copied out without assembling
+    anything. The --stats report is cached alongside the output.
+    """
+    source = input_file.read_bytes()
+    key = cache.key(source, binary=binary, optimize=optimize)
+    report_key = cache.key(source, optimize=optimize, report=True) if stats else None
+    data = cache.get(key)
+    report = None if report_key is None else cache.get(report_key)
+    if data is not None and (report_key is None or report is not None):
+        output_file.write_bytes(data)
+        if report is not None:
+            print(report.decode(), file=sys.stderr)
+        return
+    fresh = compile(input_file, output_file, binary, *args, optimize=optimize, stats=stats, **kwargs)
+    cache.put(key, output_file.read_bytes())
+    if report_key is not None and fresh is not None:
+        cache.put(report_key, fresh.report().encode())
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hasm",
+        description="Assemble program.asm into program.hack",
+    )
+    parser.add_argument(
+        "input_files",
+        nargs="+",
+        help="program.asm files, directories of them or glob patterns",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes used to assemble several files (default: all cores)",
+    )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help=f"write a packed little-endian ROM image (program{BINARY_SUFFIX})",
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="parse a line at a time using precomputed instruction tables",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="assemble line by line into the output, backpatching forward references",
+    )
+    parser.add_argument(
+        "--parallel",
+        metavar="WORKERS",
+        type=int,
+        default=0,
+        help="assemble chunks of the program across WORKERS processes",
+    )
+    parser.add_argument(
+        "-c",
+        "--object",
+        action="store_true",
+        help="write a relocatable object file (program.hobj) for hlink",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="thread jumps, drop unreachable code and run peephole optimizations",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="report basic blocks, removed words and ROM headroom on stderr",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse outputs of identical earlier runs",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        type=pathlib.Path,
+        help="keep the --cache in DIR, implies --cache"
+        " (default $HACKASS_CACHE_DIR or ~/.cache/hackass)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        type=int,
+        default=256,
+        help="evict least recently used cache entries past this size",
+    )
+    return parser
+
+
+def assemble_file(input_file: pathlib.Path, args: argparse.Namespace) -> int:
     if not input_file.is_file():
         print(f"Cannot find input file: {input_file!s}", file=sys.stderr)
         return 2
     if input_file.suffix != ".asm":
         print(f"InputFile must be a .asm but got ext={input_file.suffix!r}", file=sys.stderr)
         return 3
-    output_file = input_file.with_suffix(".hack")
+    if args.object:
+        from .objfile import SUFFIX as suffix
+    else:
+        suffix = BINARY_SUFFIX if args.binary else TEXT_SUFFIX
+    output_file = input_file.with_suffix(suffix)
+    if output_file.exists() and not output_file.is_file():
+        print(f"OutputFile is not a file: {output_file}", file=sys.stderr)
+        return 4
+    if args.object:
+        compile_object(input_file, output_file)
+        return 0
+    if not args.cache and args.cache_dir is None:
+        compile(
+            input_file,
+            output_file,
+            args.binary,
+            args.fast,
+            args.stream,
+            args.parallel,
+            optimize=args.optimize,
+            stats=args.stats,
+        )
+    else:
+        from .cache import Cache
+
+        compile_cached(
+            Cache(args.cache_dir, args.cache_size * 1024 * 1024),
+            input_file,
+            output_file,
+            args.binary,
+            args.fast,
+            args.stream,
+            args.parallel,
+            optimize=args.optimize,
+            stats=args.stats,
+        )
+    return 0
+
+
+def timed_assemble_file(
+    input_file: pathlib.Path, args: argparse.Namespace
+) -> tuple[int, float]:
+    start = time.perf_counter()
+    try:
+        code = assemble_file(input_file, args)
+    except Exception as e:
+        print(f"{input_file!s}: {e}", file=sys.stderr)
+        code = 5
+    return code, time.perf_counter() - start
+
+
+def expand_inputs(inputs: typing.Iterable[str]) -> list[pathlib.Path]:
+    "Directories expand to the .asm files in them and patterns are globbed."
+    files: list[pathlib.Path] = []
+    for spec in inputs:
+        path = pathlib.Path(spec)
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.asm")))
+        elif not path.exists() and glob.has_magic(spec):
+            files.extend(sorted(map(pathlib.Path, glob.glob(spec, recursive=True))))
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    argparser = make_argparser()
+    args = argparser.parse_args()
+    if (args.optimize or args.stats) and (args.stream or args.parallel or args.object):
+        argparser.error("-O/--stats cannot be combined with --stream, --parallel or -c")
+    files = expand_inputs(args.input_files)
+    if not files:
+        print("No input files matched", file=sys.stderr)
+        return 2
+    if len(files) == 1:
+        return assemble_file(files[0], args)
+    start = time.perf_counter()
+    if args.jobs > 1:
+        with ProcessPoolExecutor(args.jobs) as pool:
+            results = list(pool.map(timed_assemble_file, files, [args] * len(files)))
+    else:
+        results = [timed_assemble_file(file, args) for file in files]
+    code = 0
+    for file, (status, seconds) in zip(files, results):
+        code |= status
+        mark = "ok" if status == 0 else f"failed({status})"
+        print(f"{seconds * 1000:9.1f} ms  {mark:10s} {file!s}", file=sys.stderr)
+    failed = sum(1 for status, _ in results if status)
+    print(
+        f"{(time.perf_counter() - start) * 1000:9.1f} ms  total: {len(files)} files,"
+        f" {failed} failed, {args.jobs} jobs",
+        file=sys.stderr,
+    )
+    return code
+
+
+def load_object(input_file: pathlib.Path):
+    "Load a .hobj, or the object for a .asm, re-assembling it only when stale."
+    from . import objfile
+
+    if input_file.suffix == objfile.SUFFIX:
+        return objfile.load(input_file)
+    object_file = input_file.with_suffix(objfile.SUFFIX)
+    if (
+        object_file.is_file()
+        and object_file.stat().st_mtime >= input_file.stat().st_mtime
+    ):
+        return objfile.load(object_file)
+    return compile_object(input_file, object_file)
+
+
+def make_link_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hlink",
+        description="Link object files (or .asm files, via their cached objects) into a ROM",
+    )
+    parser.add_argument(
+        "input_files", type=pathlib.Path, nargs="+", help="unit.hobj or unit.asm"
+    )
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="defaults to the first input's name"
+    )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="write a packed little-endian ROM image",
+    )
+    return parser
+
+
+def link_main():
+    from .linker import link
+    from .objfile import SUFFIX
+
+    args = make_link_argparser().parse_args()
+    for input_file in args.input_files:
+        if not input_file.is_file():
+            print(f"Cannot find input file: {input_file!s}", file=sys.stderr)
+            return 2
+        if input_file.suffix not in (".asm", SUFFIX):
+            print(
+                f"InputFile must be a .asm or {SUFFIX} but got ext={input_file.suffix!r}",
+                file=sys.stderr,
+            )
+            return 3
+    output_file = args.output or args.input_files[0].with_suffix(
+        BINARY_SUFFIX if args.binary else TEXT_SUFFIX
+    )
     if output_file.exists() and not output_file.is_file():
         print(f"OutputFile is not a file: {output_file}", file=sys.stderr)
         return 4
-    compile(input_file, output_file)
+    words = link(map(load_object, args.input_files), local_labels=True)
+    write_words(words, output_file, args.binary)
+    return 0
 
+
+def make_disassemble_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hdis",
+        description="Disassemble a .hack listing or binary ROM back into assembly",
+    )
+    parser.add_argument("input_file", type=pathlib.Path, help="program.hack or program.rom")
+    parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help="write here instead of stdout"
+    )
+    parser.add_argument(
+        "-n",
+        "--numbered",
+        action="store_true",
+        help="prefix every instruction with its ROM address",
+    )
+    return parser
+
+
+def disassemble_main():
+    from . import rom
+    from .disassembler import disassemble_words
+
+    args = make_disassemble_argparser().parse_args()
+    if not args.input_file.is_file():
+        print(f"Cannot find input file: {args.input_file!s}", file=sys.stderr)
+        return 2
+    lines = disassemble_words(rom.load(args.input_file))
+    if args.numbered:
+        lines = [f"{addr:5d}: {line}" for addr, line in enumerate(lines)]
+    text = "".join(line + "\n" for line in lines)
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text)
+    return 0
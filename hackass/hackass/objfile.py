@@ -0,0 +1,113 @@
+"""
+Relocatable object files, one per assembled .asm translation unit.
+
+Layout (all fields little-endian):
+
+    magic    4s   b"HOBJ"
+    version  u16  FORMAT_VERSION
+    flags    u16  reserved, always 0
+    nwords   u32
+    nlabels  u32
+    nrefs    u32
+    words    nwords * u16          references are left as 0
+    labels   nlabels * (name, u32) labels and their offsets, hlink keeps
+                                   them local to the unit unless others
+                                   reference them
+    refs     nrefs * (name, u32 n, n * u32)
+                                   relocations: offsets referencing name
+
+where name is a u16 length followed by that many utf-8 bytes.
+"""
+
+import os
+import struct
+import sys
+import typing
+from array import array
+
+from .linker import Unit
+
+MAGIC = b"HOBJ"
+FORMAT_VERSION = 1
+SUFFIX = ".hobj"
+HEADER = struct.Struct("<4sHHIII")
+
+_NAME = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_swap = sys.byteorder != "little"
+
+
+def _pack_name(name: str) -> bytes:
+    raw = name.encode()
+    return _NAME.pack(len(raw)) + raw
+
+
+def _to_le(values: array) -> bytes:
+    if _swap:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def dumps(unit: Unit) -> bytes:
+    parts = [
+        HEADER.pack(
+            MAGIC, FORMAT_VERSION, 0, len(unit.words), len(unit.labels), len(unit.refs)
+        ),
+        _to_le(unit.words),
+    ]
+    for label, offset in unit.labels.items():
+        parts.append(_pack_name(label) + _U32.pack(offset))
+    for symbol, where in unit.refs.items():
+        parts.append(_pack_name(symbol) + _U32.pack(len(where)))
+        parts.append(_to_le(array("I", where)))
+    return b"".join(parts)
+
+
+def dump(unit: Unit, file: typing.BinaryIO):
+    file.write(dumps(unit))
+
+
+def loads(data: bytes) -> Unit:
+    if len(data) < HEADER.size:
+        raise Exception("Object file is too short to hold a header")
+    magic, version, _, nwords, nlabels, nrefs = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise Exception(f"Not an object file, bad magic {magic!r}")
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported object file version {version}")
+    pos = HEADER.size
+
+    def name() -> str:
+        nonlocal pos
+        (size,) = _NAME.unpack_from(data, pos)
+        pos += _NAME.size + size
+        return data[pos - size : pos].decode()
+
+    def read_array(n: int, typecode: str) -> array:
+        nonlocal pos
+        values = array(typecode)
+        values.frombytes(data[pos : pos + n * values.itemsize])
+        if len(values) != n:
+            raise Exception("Object file is truncated")
+        if _swap:
+            values.byteswap()
+        pos += n * values.itemsize
+        return values
+
+    unit = Unit(words=read_array(nwords, "H"))
+    for _ in range(nlabels):
+        label = name()
+        unit.labels[label] = _U32.unpack_from(data, pos)[0]
+        pos += _U32.size
+    for _ in range(nrefs):
+        symbol = name()
+        (n,) = _U32.unpack_from(data, pos)
+        pos += _U32.size
+        unit.refs[symbol] = read_array(n, "I")
+    return unit
+
+
+def load(path: str | os.PathLike) -> Unit:
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,66 @@
+import os
+import typing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from .assembler import format_words
+from .codes import PREDEFINED, USR_SYM_START
+from .linker import Unit, assemble_unit, link
+
+
+def _assemble_chunk(chunk: str, symbols: dict[str, int], first_line: int) -> Unit:
+    return assemble_unit(chunk.split("\n"), symbols, first_line)
+
+
+def split_lines(program: str, n: int) -> typing.Iterator[tuple[str, int]]:
+    "Split `program` into about `n` chunks at line boundaries, with their first line."
+    size = max(1, len(program) // max(1, n))
+    start, line = 0, 1
+    while start < len(program):
+        end = program.find("\n", start + size)
+        end = len(program) if end < 0 else end + 1
+        yield program[start:end], line
+        line += program.count("\n", start, end)
+        start = end
+
+
+def assemble_words_parallel(
+    program: str,
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    workers: int | None = None,
+    chunks_per_worker: int = 4,
+) -> array:
+    """
+    Assemble `program` in chunks across a process pool and link the results.
+
+    Each chunk is parsed and encoded into a Unit on its own; labels and
+    variables are resolved when the units are linked, so the result is
+    identical to assemble_words().
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = list(split_lines(program, workers * chunks_per_worker))
+    if workers == 1 or len(chunks) <= 1:
+        units = [_assemble_chunk(chunk, symbols, line) for chunk, line in chunks]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            texts, lines = zip(*chunks)
+            units = list(
+                pool.map(_assemble_chunk, texts, [symbols] * len(chunks), lines)
+            )
+    return link(units, sym_cnt_start)
+
+
+def assemble_parallel(
+    program: str,
+    /,
+    symbols: dict[str, int] = PREDEFINED,
+    sym_cnt_start: int = USR_SYM_START,
+    *,
+    workers: int | None = None,
+) -> str:
+    return format_words(
+        assemble_words_parallel(program, symbols, sym_cnt_start, workers=workers)
+    )
@@ -0,0 +1,148 @@
+import typing
+
+from .codes import COMP_MNEMONICS, PREDEFINED, CompCodes, DestCodes, JumpCodes
+from .lexer import Token
+from .utils import AInstruction, CInstruction, Instruction
+
+# Registers read by each comp, "M" meaning RAM[A].
+_READS: dict[CompCodes, str] = {
+    code: "".join(r for r in "ADM" if r in spelling)
+    for code, spelling in COMP_MNEMONICS.items()
+}
+_WITHOUT_D: dict[DestCodes, DestCodes] = {
+    DestCodes.D: DestCodes.NULL,
+    DestCodes.DM: DestCodes.M,
+    DestCodes.AD: DestCodes.A,
+    DestCodes.ADM: DestCodes.AM,
+}
+
+
+def is_label(inst: Instruction) -> bool:
+    return isinstance(inst, AInstruction) and inst.value.typ == Token.Type.LABEL
+
+
+def a_value(inst: AInstruction, symbols: dict[str, int]) -> int | str:
+    "What an A-instruction loads into A, a symbol's name while it is unresolved."
+    tk = inst.value
+    if tk.typ == Token.Type.INT:
+        return int(tk.lexeme, 2)
+    return symbols.get(tk.lexeme, tk.lexeme)
+
+
+def uses_a(inst: CInstruction) -> bool:
+    "The C-instruction reads A as data, directly or as the address of M."
+    return "A" in _READS[inst.comp] or "M" in _READS[inst.comp] or "M" in inst.dest.name
+
+
+def a_is_dead(insts: typing.Sequence[Instruction], start: int) -> bool:
+    "A is overwritten from `start` on before anything reads it."
+    for k in range(start, len(insts)):
+        match insts[k]:
+            case AInstruction(value=Token(typ=Token.Type.LABEL)):
+                return False
+            case AInstruction():
+                return True
+            case CInstruction(dest=dest, jump=jump) as inst:
+                if uses_a(inst):
+                    return False
+                if jump is not JumpCodes.NULL:
+                    return False
+                if "A" in dest.name:
+                    return True
+    return False
+
+
+def d_is_dead(insts: typing.Sequence[Instruction], start: int) -> bool:
+    "D is overwritten from `start` on, within the block, before anything reads it."
+    for k in range(start, len(insts)):
+        match insts[k]:
+            case AInstruction(value=Token(typ=Token.Type.LABEL)):
+                return False
+            case CInstruction(dest=dest, comp=comp, jump=jump):
+                if "D" in _READS[comp]:
+                    return False
+                if "D" in dest.name:
+                    return True
+                if jump is not JumpCodes.NULL:
+                    return False
+    return False
+
+
+def drop_jumps_to_next(insts: list[Instruction]) -> list[Instruction]:
+    "Remove `@L / ;JMP` when (L) directly follows and A is not read after it."
+    out: list[Instruction] = []
+    i, n = 0, len(insts)
+    while i < n:
+        inst = insts[i]
+        if (
+            i + 2 < n
+            and isinstance(inst, AInstruction)
+            and inst.value.typ == Token.Type.ID
+            and isinstance(jmp := insts[i + 1], CInstruction)
+            and jmp.jump is not JumpCodes.NULL
+            and jmp.dest is DestCodes.NULL
+        ):
+            j = i + 2
+            targets: set[str] = set()
+            while j < n and is_label(insts[j]):
+                targets.add(typing.cast(AInstruction, insts[j]).value.lexeme)
+                j += 1
+            if inst.value.lexeme in targets and a_is_dead(insts, j):
+                i += 2
+                continue
+        out.append(inst)
+        i += 1
+    return out
+
+
+def drop_reloads(insts: list[Instruction], symbols: dict[str, int]) -> list[Instruction]:
+    "Remove `@X` while A is already known to hold X."
+    out: list[Instruction] = []
+    known: int | str | None = None
+    for inst in insts:
+        if isinstance(inst, AInstruction):
+            if inst.value.typ == Token.Type.LABEL:
+                # Jumps may land here with anything in A. After a jump
+                # instruction A is left as it was on the fall through path.
+                known = None
+            else:
+                value = a_value(inst, symbols)
+                if value == known:
+                    continue
+                known = value
+        elif "A" in inst.dest.name:
+            known = None
+        out.append(inst)
+    return out
+
+
+def drop_dead_d_writes(insts: list[Instruction]) -> list[Instruction]:
+    "Remove writes to D that are overwritten within the block before use."
+    out: list[Instruction] = []
+    for i, inst in enumerate(insts):
+        if (
+            isinstance(inst, CInstruction)
+            and inst.jump is JumpCodes.NULL
+            and inst.dest in _WITHOUT_D
+            and d_is_dead(insts, i + 1)
+        ):
+            dest = _WITHOUT_D[inst.dest]
+            if dest is DestCodes.NULL:
+                continue
+            inst = CInstruction(dest, inst.comp, inst.jump)
+        out.append(inst)
+    return out
+
+
+def optimize(
+    insts: typing.Iterable[Instruction], /, symbols: dict[str, int] = PREDEFINED
+) -> list[Instruction]:
+    "Run the peephole passes over a parsed instruction stream until nothing changes."
+    insts = list(insts)
+    while True:
+        out = drop_jumps_to_next(insts)
+        out = drop_reloads(out, symbols)
+        out = drop_dead_d_writes(out)
+        if out == insts:
+            return out
+        insts = out
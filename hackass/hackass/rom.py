@@ -0,0 +1,92 @@
+"""
+Packed binary ROM images.
+
+Layout (all fields little-endian):
+
+    magic   4s   b"HACK"
+    version u16  FORMAT_VERSION
+    flags   u16  reserved, always 0
+    count   u32  number of instruction words that follow
+    words   count * u16
+
+The header is 12 bytes so the word data stays 2-byte aligned and can be
+viewed in place through a memoryview of an mmap.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import typing
+from array import array
+
+MAGIC = b"HACK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+
+_swap = sys.byteorder != "little"
+
+
+def header(count: int) -> bytes:
+    return HEADER.pack(MAGIC, FORMAT_VERSION, 0, count)
+
+
+def _check_header(data: bytes | memoryview | mmap.mmap) -> int:
+    if len(data) < HEADER.size:
+        raise Exception("ROM image is too short to hold a header")
+    magic, version, _, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise Exception(f"Not a binary ROM image, bad magic {magic!r}")
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported ROM format version {version}")
+    if len(data) - HEADER.size != 2 * count:
+        raise Exception(
+            f"ROM image holds {(len(data) - HEADER.size) // 2} words but header says {count}"
+        )
+    return count
+
+
+def dumps(words: typing.Iterable[int]) -> bytes:
+    "Serialize instruction words into a binary ROM image."
+    data = words if isinstance(words, array) and words.typecode == "H" else array("H", words)
+    if _swap:
+        data = array("H", data)
+        data.byteswap()
+    return header(len(data)) + data.tobytes()
+
+
+def dump(words: typing.Iterable[int], file: typing.BinaryIO):
+    file.write(dumps(words))
+
+
+def loads(data: bytes | memoryview) -> array:
+    "Parse a binary ROM image or textual .hack listing into array('H')."
+    if bytes(data[: len(MAGIC)]) != MAGIC:
+        return array("H", (int(line, 2) for line in bytes(data).split()))
+    _check_header(data)
+    words = array("H")
+    words.frombytes(data[HEADER.size :])
+    if _swap:
+        words.byteswap()
+    return words
+
+
+def load(path: str | os.PathLike) -> array:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def map_rom(path: str | os.PathLike) -> memoryview | array:
+    """
+    Map a binary ROM image without copying or parsing it.
+
+    Returns a read-only memoryview of unsigned 16bit words backed by the file.
+    On big-endian hosts the words cannot be viewed in place and a byteswapped
+    array('H') is returned instead.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _check_header(mm)
+    if _swap:
+        return loads(mm)
+    return memoryview(mm)[HEADER.size :].cast("H")
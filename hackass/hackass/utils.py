@@ -14,6 +14,9 @@ class CInstruction:
     jump: JumpCodes
 
 
+Instruction = AInstruction | CInstruction
+
+
 class EOSsentinelType: ...
 
 
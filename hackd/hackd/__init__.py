@@ -0,0 +1,8 @@
+def __getattr__(name: str):
+    if name in ("Client", "default_socket"):
+        from . import client
+
+        value = getattr(client, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"Module {__name__} does not export name {name!r}")
@@ -0,0 +1 @@
+from .client import Client, default_socket
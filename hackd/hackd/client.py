@@ -0,0 +1,75 @@
+import os
+import socket
+import tempfile
+import typing
+
+from . import jobs
+from .protocol import recv_message, send_message
+
+SOCKET_ENV = "HACKD_SOCKET"
+
+
+def default_socket() -> str:
+    if path := os.getenv(SOCKET_ENV):
+        return path
+    base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"hackd-{os.getuid()}.sock")
+
+
+class Client:
+    """
+    Sends jobs to a running hackd server, or runs them in-process when none
+    is listening and `fallback` is set.
+    """
+
+    def __init__(self, path: str | None = None, fallback: bool = True):
+        self.path = default_socket() if path is None else path
+        self.fallback = fallback
+        self.sock: socket.socket | None = None
+
+    def connect(self) -> socket.socket | None:
+        if self.sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if not self.fallback:
+                    raise
+                return None
+            self.sock = sock
+        return self.sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def request(self, header: dict, payload: bytes = b"") -> bytes:
+        sock = self.connect()
+        if sock is None:
+            response, output = jobs.run(header, payload)
+        else:
+            send_message(sock, header, payload)
+            response, output = recv_message(sock)
+        if not response.get("ok"):
+            raise Exception(response.get("error", "hackd request failed"))
+        return output
+
+    def remote(self) -> bool:
+        return self.connect() is not None
+
+    def assemble(self, source: bytes, *, binary: bool = False, optimize: bool = False) -> bytes:
+        return self.request(
+            {"op": "assemble", "binary": binary, "optimize": optimize}, source
+        )
+
+    def translate(self, name: str, source: bytes, paths: typing.Iterable[str] = ()) -> bytes:
+        header = {"op": "translate", "name": name, "paths": [os.path.abspath(p) for p in paths]}
+        return self.request(header, source)
@@ -0,0 +1,57 @@
+import pathlib
+import typing
+
+type Handler = typing.Callable[[dict, bytes], bytes]
+
+
+def assemble(header: dict, payload: bytes) -> bytes:
+    from hackass.assembler import assemble_words, format_words
+
+    words = assemble_words(
+        payload.decode(), fast=True, optimize=bool(header.get("optimize"))
+    )
+    if header.get("binary"):
+        from hackass import rom
+
+        return rom.dumps(words)
+    return format_words(words).encode()
+
+
+def translate(header: dict, payload: bytes) -> bytes:
+    from hackvm.translator import Translator
+
+    trans = Translator([pathlib.Path(path) for path in header.get("paths", ())])
+    lines = trans.translate(header["name"], payload.decode())
+    return "".join(line + "\n" for line in lines).encode()
+
+
+def ping(header: dict, payload: bytes) -> bytes:
+    return payload
+
+
+JOBS: dict[str, Handler] = {
+    "assemble": assemble,
+    "translate": translate,
+    "ping": ping,
+}
+
+
+def warm_up():
+    "Import everything the jobs need so forked workers start ready."
+    import hackass.assembler
+    import hackass.cfg
+    import hackass.peephole
+    import hackass.rom
+    import hackvm.translator  # noqa: F401
+
+
+def run(header: dict, payload: bytes) -> tuple[dict, bytes]:
+    "Execute one request, turning failures into an error response."
+    job = JOBS.get(header.get("op", ""))
+    if job is None:
+        return {"ok": False, "error": f"Unknown op {header.get('op')!r}"}, b""
+    try:
+        return {"ok": True}, job(header, payload)
+    except Exception as e:
+        notes = "".join(f"\n{note}" for note in getattr(e, "__notes__", ()))
+        return {"ok": False, "error": f"{e}{notes}"}, b""
@@ -0,0 +1,96 @@
+import argparse
+import pathlib
+import sys
+
+from .client import Client, default_socket
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hackd",
+        description="Run hasm/havm jobs through a warm server on a Unix socket",
+    )
+    parser.add_argument(
+        "--socket", default=default_socket(), help="server socket path (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--no-fallback",
+        dest="fallback",
+        action="store_false",
+        help="fail instead of running in-process when no server is listening",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the server in the foreground")
+    commands.add_parser("ping", help="check whether a server is listening")
+    asm = commands.add_parser("asm", help="assemble program.asm files like hasm")
+    asm.add_argument("input_files", type=pathlib.Path, nargs="+")
+    asm.add_argument("-b", "--binary", action="store_true")
+    asm.add_argument("-O", "--optimize", action="store_true")
+    vm = commands.add_parser("vm", help="translate Program.vm files like havm")
+    vm.add_argument("input_files", type=pathlib.Path, nargs="+")
+    return parser
+
+
+def assemble_files(client: Client, args: argparse.Namespace) -> int:
+    from hackass.main import BINARY_SUFFIX, TEXT_SUFFIX
+
+    code = 0
+    for input_file in args.input_files:
+        if not input_file.is_file() or input_file.suffix != ".asm":
+            print(f"Not a .asm file: {input_file!s}", file=sys.stderr)
+            code |= 2
+            continue
+        try:
+            output = client.assemble(
+                input_file.read_bytes(), binary=args.binary, optimize=args.optimize
+            )
+        except Exception as e:
+            print(f"{input_file!s}: {e}", file=sys.stderr)
+            code |= 5
+            continue
+        suffix = BINARY_SUFFIX if args.binary else TEXT_SUFFIX
+        input_file.with_suffix(suffix).write_bytes(output)
+    return code
+
+
+def translate_files(client: Client, args: argparse.Namespace) -> int:
+    from hackvm.main import get_paths
+
+    code = 0
+    for input_file in args.input_files:
+        if not input_file.is_file() or input_file.suffix != ".vm":
+            print(f"Not a .vm file: {input_file!s}", file=sys.stderr)
+            code |= 2
+            continue
+        paths = map(str, get_paths(curdir=input_file.parent))
+        try:
+            output = client.translate(input_file.stem, input_file.read_bytes(), paths)
+        except Exception as e:
+            print(f"{input_file!s}: {e}", file=sys.stderr)
+            code |= 5
+            continue
+        input_file.with_suffix(".asm").write_bytes(output)
+    return code
+
+
+def main():
+    args = make_argparser().parse_args()
+    if args.command == "serve":
+        from .server import serve
+
+        try:
+            serve(args.socket)
+        except Exception as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+    with Client(args.socket, args.fallback) as client:
+        match args.command:
+            case "ping":
+                remote = client.remote()
+                print(f"hackd is {'' if remote else 'not '}listening on {client.path}")
+                return 0 if remote else 1
+            case "asm":
+                return assemble_files(client, args)
+            case "vm":
+                return translate_files(client, args)
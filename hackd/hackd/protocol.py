@@ -0,0 +1,39 @@
+"""
+Every message is two frames, a JSON header then a raw payload, each sent as
+a big-endian u32 length followed by that many bytes.
+"""
+
+import json
+import socket
+import struct
+
+_LENGTH = struct.Struct(">I")
+MAX_FRAME = 1 << 30
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks: list[bytes] = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("Connection closed mid message")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(recv_exact(sock, _LENGTH.size))
+    if size > MAX_FRAME:
+        raise Exception(f"Frame of {size} bytes exceeds {MAX_FRAME}")
+    return recv_exact(sock, size)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    raw = json.dumps(header).encode()
+    sock.sendall(b"".join((_LENGTH.pack(len(raw)), raw, _LENGTH.pack(len(payload)), payload)))
+
+
+def recv_message(sock: socket.socket) -> tuple[dict, bytes]:
+    header = json.loads(recv_frame(sock))
+    return header, recv_frame(sock)
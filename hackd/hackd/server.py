@@ -0,0 +1,68 @@
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+
+from . import jobs
+from .protocol import recv_message, send_message
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except EOFError:
+                return
+            send_message(self.request, *jobs.run(header, payload))
+
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    "Every connection is served by a fork of the warmed up server process."
+
+    block_on_close = False
+
+
+def listening(path: str) -> bool:
+    "Whether a server answers on `path`."
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+def serve(path: str):
+    """
+    Serve on `path` until interrupted. A socket left behind by a server that
+    died is replaced, one a server still answers on is an error.
+    """
+    if listening(path):
+        raise Exception(f"A server is already listening on {path}")
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        if not stat.S_ISSOCK(mode):
+            raise Exception(f"{path} exists and is not a socket")
+        os.unlink(path)
+    jobs.warm_up()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with Server(path, Handler) as server:
+        os.chmod(path, 0o600)
+        inode = os.stat(path).st_ino
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Another server may have replaced a socket removed under us.
+            try:
+                if os.stat(path).st_ino == inode:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,7 @@
+def __getattr__(name: str):
+    if name == "Machine":
+        global Machine
+        from .machine import Machine
+
+        return Machine
+    raise AttributeError(f"Module {__name__} does not export name {name!r}")
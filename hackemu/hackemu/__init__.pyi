@@ -0,0 +1 @@
+from .machine import Machine
@@ -0,0 +1,4 @@
+if __name__ == "__main__":
+    from .main import main
+
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""
+Many Hack machines running the same ROM in lockstep, for fuzzing and
+grading against thousands of initial RAM states at once. Registers are
+arrays of shape [N] and RAM one of shape [N, RAM_SIZE]; every step runs
+one ROM word across all the machines sitting on it with vectorized ALU
+ops and masked writes, grouping machines by PC once they diverge.
+
+Needs numpy, `pip install hackemu[batch]`.
+"""
+
+import functools
+import typing
+
+import numpy as np
+
+from .decode import ADDR_MASK, RAM_SIZE, decode
+
+Array = np.ndarray
+BatchALU = typing.Callable[[Array, Array], Array]
+
+
+@functools.cache
+def batch_alu(bits: int) -> BatchALU:
+    "The ALU for control bits zx nx zy ny f no over int16 arrays, which wrap like the hardware."
+    zx, nx, zy, ny, f, no = ((bits >> shift) & 1 for shift in range(5, -1, -1))
+
+    def alu(x: Array, y: Array) -> Array:
+        if zx:
+            x = np.zeros_like(x)
+        if nx:
+            x = ~x
+        if zy:
+            y = np.zeros_like(y)
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        return ~out if no else out
+
+    return alu
+
+
+BatchOp = int | tuple[BatchALU, bool, bool, bool, bool, tuple[bool, bool, bool] | None, bool]
+
+
+def batch_decode(rom: typing.Sequence[int]) -> list[BatchOp | None]:
+    "decode() with ALUs that work on arrays."
+    code: list[BatchOp | None] = list(decode(rom))
+    for pc, op in enumerate(code):
+        if op is not None and op.__class__ is not int:
+            _, use_m, dest_a, dest_d, dest_m, jump, halt = op
+            code[pc] = (batch_alu((rom[pc] >> 6) & 0x3F), use_m, dest_a, dest_d, dest_m, jump, halt)
+    return code
+
+
+class BatchMachine:
+    """
+    `n` Hack machines sharing one ROM. Each has its own A, D, PC, cycle
+    count, halted flag and row of `ram`, the way Machine has them.
+    """
+
+    __slots__ = "rom", "code", "ram", "a", "d", "pc", "cycles", "halted"
+
+    def __init__(self, rom: typing.Iterable[int], n: int):
+        self.rom = np.fromiter(rom, dtype=np.uint16)
+        self.code = batch_decode(self.rom.tolist())
+        self.ram = np.zeros((n, RAM_SIZE), dtype=np.int16)
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.ram)
+
+    def reset(self):
+        "Reset every CPU, RAM is left as is like Machine.reset."
+        n = len(self.ram)
+        self.a = np.zeros(n, dtype=np.int16)
+        self.d = np.zeros(n, dtype=np.int16)
+        self.pc = np.zeros(n, dtype=np.int32)
+        self.cycles = np.zeros(n, dtype=np.int64)
+        self.halted = np.zeros(n, dtype=bool)
+
+    def run(self, max_cycles: int) -> int:
+        """
+        Step every machine that has not halted at most `max_cycles` times.
+        Returns the number of steps taken, which is what a machine that
+        kept running executed.
+        """
+        code, ram = self.code, self.ram
+        a, d, pc, halted = self.a, self.d, self.pc, self.halted
+        live = np.flatnonzero(~halted)
+        steps = 0
+        while steps < max_cycles and live.size:
+            pcs = pc[live]
+            first = pcs[0]
+            if (pcs == first).all():
+                groups: typing.Iterable[tuple[int, Array]] = ((int(first), live),)
+            else:
+                order = np.argsort(pcs, kind="stable")
+                starts = np.flatnonzero(np.diff(pcs[order])) + 1
+                groups = ((int(pcs[rows[0]]), live[rows]) for rows in np.split(order, starts))
+            self.cycles[live] += 1
+            stopped = False
+            for where, rows in groups:
+                op = code[where]
+                if op.__class__ is int:
+                    a[rows] = op
+                    pc[rows] = where + 1
+                    continue
+                if op is None:
+                    self.cycles[rows] -= 1
+                    halted[rows] = stopped = True
+                    continue
+                alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+                a_rows = a[rows]
+                addrs = a_rows & ADDR_MASK
+                r = alu(d[rows], ram[rows, addrs] if use_m else a_rows)
+                if dest_m:
+                    ram[rows, addrs] = r
+                if jump is None:
+                    pc[rows] = where + 1
+                else:
+                    lt, eq, gt = jump
+                    if lt and eq and gt:
+                        taken = np.ones(len(rows), dtype=bool)
+                    else:
+                        taken = np.zeros(len(rows), dtype=bool)
+                        if lt:
+                            taken |= r < 0
+                        if eq:
+                            taken |= r == 0
+                        if gt:
+                            taken |= r > 0
+                    pc[rows] = np.where(taken, addrs, where + 1)
+                    if halt:
+                        spinning = taken & (a_rows == where - 1)
+                        if spinning.any():
+                            pc[rows[spinning]] = where
+                            halted[rows[spinning]] = stopped = True
+                if dest_a:
+                    a[rows] = r
+                if dest_d:
+                    d[rows] = r
+            if stopped:
+                live = live[~halted[live]]
+            steps += 1
+        return steps
@@ -0,0 +1,144 @@
+"""
+Basic block compilation: every straight-line run of ROM words up to and
+including the next jump is turned into one generated Python function
+
+    block(a, d, ram) -> (a, d, next_pc)
+
+the first time control reaches its start. A values loaded by @ instructions
+are folded into the code, so `@SP / M=M+1` becomes `ram[0] = ...` with no A
+register traffic at all. A block that halts returns ~pc of its halting jump.
+"""
+
+import typing
+
+from .decode import ADDR_MASK, ALU_TEMPLATES, ROM_SIZE, _generic_alu
+from .machine import Machine
+
+BlockFn = typing.Callable[[int, int, typing.MutableSequence[int]], tuple[int, int, int]]
+MAX_BLOCK = 512
+
+_CONDITIONS: dict[int, str] = {
+    1: "r > 0",
+    2: "r == 0",
+    3: "r >= 0",
+    4: "r < 0",
+    5: "r != 0",
+    6: "r <= 0",
+}
+
+
+def block_source(rom: typing.Sequence[int], start: int) -> tuple[str, int, dict[str, object]]:
+    "Python source for the block starting at `start`, its length and globals."
+    env: dict[str, object] = {}
+    body: list[str] = []
+    known: int | None = None  # value of A when it is a compile time constant
+
+    def a_expr() -> str:
+        return "a" if known is None else str(known)
+
+    def m_ref() -> str:
+        return f"ram[a & {ADDR_MASK}]" if known is None else f"ram[{known}]"
+
+    pc, end = start, min(len(rom), start + MAX_BLOCK)
+    while pc < end:
+        word = rom[pc]
+        pc += 1
+        if not word & 0x8000:
+            known = word
+            continue
+        bits = (word >> 6) & 0x3F
+        y = m_ref() if word & 0x1000 else a_expr()
+        if (template := ALU_TEMPLATES.get(bits)) is not None:
+            expr = template.format(x="d", y=y)
+        else:
+            env[f"alu_{bits}"] = _generic_alu(bits)
+            expr = f"alu_{bits}(d, {y})"
+        dest_a, dest_d, dest_m = word & 0x20, word & 0x10, word & 0x08
+        jump = word & 0x7
+        dests = bool(dest_a) + bool(dest_d) + bool(dest_m)
+        # The jump target is A before this instruction writes it.
+        target = "t" if known is None else str(known & ADDR_MASK)
+        halts = jump == 7 and not dests and pc >= 2 and rom[pc - 2] == pc - 2
+        spins = halts and known == pc - 2
+        if not jump and dests == 1:
+            lhs = "a" if dest_a else "d" if dest_d else m_ref()
+            body.append(f"{lhs} = {expr}")
+        else:
+            if dests or jump not in (0, 7):
+                body.append(f"r = {expr}")
+            if dest_m:
+                body.append(f"{m_ref()} = r")
+            if jump and known is None:
+                body.append(f"t = a & {ADDR_MASK}")
+            if dest_a:
+                body.append("a = r")
+            if dest_d:
+                body.append("d = r")
+        if dest_a:
+            known = None
+        if jump:
+            if spins:
+                target = str(~(pc - 1))
+            elif halts:
+                target = f"({target} if a != {pc - 2} else {~(pc - 1)})"
+            if jump == 7:
+                body.append(f"return {a_expr()}, d, {target}")
+            else:
+                body.append(f"if {_CONDITIONS[jump]}:")
+                body.append(f"    return {a_expr()}, d, {target}")
+                body.append(f"return {a_expr()}, d, {pc}")
+            break
+    else:
+        body.append(f"return {a_expr()}, d, {pc}")
+    lines = "\n".join(f"    {line}" for line in body)
+    return f"def block(a, d, ram):\n{lines}\n", pc - start, env
+
+
+def compile_block(rom: typing.Sequence[int], start: int) -> tuple[BlockFn, int]:
+    source, length, env = block_source(rom, start)
+    exec(compile(source, f"<hack block {start}>", "exec"), env)
+    return typing.cast(BlockFn, env["block"]), length
+
+
+class BlockMachine(Machine):
+    """
+    Machine that runs compiled basic blocks, dispatching only between them.
+    Blocks are compiled on first entry and cached by start PC; the last few
+    cycles of a run that do not fit a whole block are interpreted.
+    """
+
+    __slots__ = ("blocks",)
+
+    def __init__(self, rom: typing.Iterable[int]):
+        super().__init__(rom)
+        self.blocks: list[tuple[BlockFn, int] | None] = [None] * ROM_SIZE
+
+    def run(self, max_cycles: int) -> int:
+        rom, ram, blocks = self.rom, self.ram, self.blocks
+        size = len(rom)
+        a, d, pc = self.a, self.d, self.pc
+        budget = max_cycles
+        halted = False
+        while budget > 0:
+            entry = blocks[pc]
+            if entry is None:
+                if pc >= size:
+                    halted = True
+                    break
+                entry = blocks[pc] = compile_block(rom, pc)
+            block, length = entry
+            if length > budget:
+                break
+            a, d, pc = block(a, d, ram)
+            budget -= length
+            if pc < 0:
+                pc = ~pc
+                halted = True
+                break
+        self.a, self.d, self.pc = a, d, pc
+        executed = max_cycles - budget
+        self.cycles += executed
+        self.halted = halted
+        if budget > 0 and not halted:
+            executed += super().run(budget)
+        return executed
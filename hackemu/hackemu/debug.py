@@ -0,0 +1,219 @@
+"""
+Breakpoints and watchpoints.
+
+Breakpoints cost nothing: the Debugger runs the machine on its own copy
+of the decoded ROM in which every breakpoint is replaced by None, the
+marker Machine.run already stops at for running off the ROM, so the
+unmodified interpreter loop does the work. Only while watchpoints are
+armed does it switch to an instrumented copy of the loop, which looks up
+the address of every RAM write in a byte mask.
+"""
+
+import dataclasses
+import typing
+
+from hackass.codes import PREDEFINED
+
+from .decode import ADDR_MASK, RAM_SIZE, decode
+from .machine import Machine
+
+# Called with the address, old and new value of a watched write, stopping
+# the run when it returns true.
+Condition = typing.Callable[[int, int, int], bool]
+
+
+def changed(addr: int, old: int, new: int) -> bool:
+    return old != new
+
+
+# The VM's registers by their usual names, as fields of hackvm.codegen.Symbols.
+VM_REGISTERS = {"SP": "stack", "LCL": "local", "ARG": "argument", "TEMP": "temp", "STATIC": "static"}
+
+
+def ram_address(name: str) -> int:
+    """
+    The address of an assembler symbol such as R13 or SCREEN, or with
+    hackvm around, of a VM register such as SP, LCL or ARG or any field of
+    hackvm.codegen.Symbols.
+    """
+    if name in PREDEFINED:
+        return PREDEFINED[name]
+    try:
+        from hackvm.codegen import Symbols
+    except ImportError:
+        raise Exception(f"Unknown RAM symbol {name!r}") from None
+    value = getattr(Symbols(), VM_REGISTERS.get(name, name), None)
+    if not isinstance(value, int):
+        raise Exception(f"Unknown RAM symbol {name!r}")
+    return value
+
+
+def _ram_location(text: str) -> int:
+    return int(text, 0) if text[:1].isdigit() else ram_address(text)
+
+
+def parse_location(spec: str) -> range:
+    "NAME, ADDR or START:END, either a name or decimal or 0x hex"
+    start, _, end = spec.partition(":")
+    first = _ram_location(start)
+    return range(first, _ram_location(end) if end else first + 1)
+
+
+def _locations(where: int | str | range) -> range:
+    if isinstance(where, str):
+        where = parse_location(where)
+    elif isinstance(where, int):
+        where = range(where, where + 1)
+    if not where:
+        raise Exception(f"Watchpoint at {where.start}:{where.stop} covers no address")
+    if not (0 <= where.start and where.stop <= RAM_SIZE):
+        raise Exception(f"Watchpoint at {where.start}:{where.stop} is outside the RAM of {RAM_SIZE} words")
+    return where
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Hit:
+    "Why a run stopped: a breakpoint at `pc`, or a write to `addr` by the instruction at `pc`."
+
+    pc: int
+    addr: int | None = None
+    old: int = 0
+    new: int = 0
+
+    @property
+    def watch(self) -> bool:
+        return self.addr is not None
+
+
+class Debugger:
+    """
+    Runs `machine` stopping at breakpoints and watched writes. `labels`
+    are the assembler's, for breakpoints by label name.
+    """
+
+    __slots__ = "machine", "labels", "plain", "code", "breakpoints", "mask", "watches"
+
+    def __init__(self, machine: Machine, labels: dict[str, int] | None = None):
+        self.machine = machine
+        self.labels = labels or {}
+        # Decoded afresh, the machine's code may hold fused or compiled ops.
+        self.plain = decode(machine.rom)
+        self.code = list(self.plain)
+        self.breakpoints: set[int] = set()
+        self.mask = bytearray(RAM_SIZE)
+        self.watches: dict[int, list[Condition]] = {}
+
+    def _address(self, where: int | str) -> int:
+        if isinstance(where, str):
+            if where not in self.labels:
+                raise Exception(f"Unknown label {where!r}")
+            where = self.labels[where]
+        if not 0 <= where < len(self.machine.rom):
+            raise Exception(f"Breakpoint at {where} is outside the ROM of {len(self.machine.rom)} words")
+        return where
+
+    def add_breakpoint(self, where: int | str):
+        "Stop before executing the ROM address or label `where`."
+        pc = self._address(where)
+        self.breakpoints.add(pc)
+        self.code[pc] = None
+
+    def remove_breakpoint(self, where: int | str):
+        pc = self._address(where)
+        self.breakpoints.discard(pc)
+        self.code[pc] = self.plain[pc]
+
+    def add_watchpoint(self, where: int | str | range, condition: Condition = changed):
+        """
+        Stop after a write to RAM in `where`, an address, range or RAM
+        symbol name, for which `condition` holds, by default one changing
+        the value.
+        """
+        for addr in _locations(where):
+            self.watches.setdefault(addr, []).append(condition)
+            self.mask[addr] = 1
+
+    def remove_watchpoints(self, where: int | str | range):
+        for addr in _locations(where):
+            self.watches.pop(addr, None)
+            self.mask[addr] = 0
+
+    def run(self, max_cycles: int) -> Hit | None:
+        """
+        Run at most `max_cycles` instructions like Machine.run, returning
+        what stopped the run early, if a breakpoint or watchpoint did. A
+        breakpoint the machine sits on is stepped over.
+        """
+        machine = self.machine
+        if not max_cycles or machine.halted:
+            return None
+        executed = 0
+        if (pc := machine.pc) in self.breakpoints:
+            self.code[pc] = self.plain[pc]
+            try:
+                executed, hit = self._run(1)
+            finally:
+                self.code[pc] = None
+            if hit is not None or machine.halted:
+                return hit
+        _, hit = self._run(max_cycles - executed)
+        if hit is None and machine.halted and machine.pc in self.breakpoints:
+            machine.halted = False
+            hit = Hit(machine.pc)
+        return hit
+
+    def _run(self, max_cycles: int) -> tuple[int, Hit | None]:
+        if self.watches:
+            return self._watched_run(max_cycles)
+        machine = self.machine
+        code, machine.code = machine.code, self.code
+        try:
+            return Machine.run(machine, max_cycles), None
+        finally:
+            machine.code = code
+
+    def _watched_run(self, max_cycles: int) -> tuple[int, Hit | None]:
+        machine = self.machine
+        code, ram, mask, watches = self.code, machine.ram, self.mask, self.watches
+        a, d, pc = machine.a, machine.d, machine.pc
+        budget = max_cycles
+        halted = False
+        hit = None
+        while budget:
+            op = code[pc]
+            budget -= 1
+            if op.__class__ is int:
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                budget += 1
+                halted = True
+                break
+            alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+            r = alu(d, ram[a & ADDR_MASK] if use_m else a)
+            if dest_m:
+                addr = a & ADDR_MASK
+                if mask[addr]:
+                    old = ram[addr]
+                    if any(condition(addr, old, r) for condition in watches[addr]):
+                        hit = Hit(pc, addr, old, r)
+                ram[addr] = r
+            if jump is not None and jump[(r >= 0) + (r > 0)]:
+                if halt and a == pc - 1:
+                    halted = True
+                    break
+                pc = a & ADDR_MASK
+            else:
+                pc += 1
+            if dest_a:
+                a = r
+            if dest_d:
+                d = r
+            if hit is not None:
+                break
+        machine.a, machine.d, machine.pc = a, d, pc
+        machine.halted = halted
+        executed = max_cycles - budget
+        machine.cycles += executed
+        return executed, hit
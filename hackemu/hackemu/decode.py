@@ -0,0 +1,115 @@
+"""
+Predecoding of ROM words into what the interpreter loop executes.
+
+An A-instruction decodes to the int it loads. A C-instruction decodes to
+the tuple (alu, use_m, dest_a, dest_d, dest_m, jump, halt) where alu(x, y)
+computes the comp part from x=D and y=A or M, jump is None or a triple of
+whether to jump when the result is (<0, ==0, >0) and halt marks a jump
+that would spin on itself forever, as in `(END) @END 0;JMP`.
+
+Registers and RAM hold signed 16bit values, the way array('h') stores them.
+"""
+
+import functools
+import typing
+
+from hackass.codes import COMP_MNEMONICS, JUMP_BITS, JumpCodes
+
+ALU = typing.Callable[[int, int], int]
+Op = int | tuple[ALU, bool, bool, bool, bool, tuple[bool, bool, bool] | None, bool]
+
+ROM_SIZE = 0x8000
+RAM_SIZE = 0x8000
+ADDR_MASK = 0x7FFF
+
+
+def wrap(value: int) -> int:
+    "Truncate to a signed 16bit value."
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+def _alu_template(mnemonic: str) -> str:
+    "The comp mnemonic as a Python expression with {x} for D and {y} for A or M."
+    names = {"D": "{x}", "A": "{y}", "M": "{y}", "!": "~"}
+    expr = "".join(names.get(char, char) for char in mnemonic)
+    if ("+" in expr or "-" in expr) and expr != "-1":
+        expr = f"((({expr}) + 0x8000) & 0xFFFF) - 0x8000"
+    return expr
+
+
+# Expressions for the documented comp codes keyed by their zx nx zy ny f no
+# bits, written out from the mnemonics.
+ALU_TEMPLATES: dict[int, str] = {
+    int(code, 2) & 0x3F: _alu_template(mnemonic) for code, mnemonic in COMP_MNEMONICS.items()
+}
+_ALUS: dict[int, ALU] = {
+    bits: eval(f"lambda x, y: {template.format(x='x', y='y')}")
+    for bits, template in ALU_TEMPLATES.items()
+}
+
+
+def _generic_alu(bits: int) -> ALU:
+    "Follow the ALU's control bits literally, for undocumented comp codes."
+    zx, nx, zy, ny, f, no = ((bits >> shift) & 1 for shift in range(5, -1, -1))
+
+    def alu(x: int, y: int) -> int:
+        if zx:
+            x = 0
+        if nx:
+            x = ~x
+        if zy:
+            y = 0
+        if ny:
+            y = ~y
+        out = x + y if f else x & y
+        return wrap(~out if no else out)
+
+    return alu
+
+
+def alu(bits: int) -> ALU:
+    return _ALUS.get(bits) or _generic_alu(bits)
+
+
+_JUMPS: dict[int, tuple[bool, bool, bool] | None] = {
+    JUMP_BITS[code]: None
+    if code is JumpCodes.NULL
+    else (bool(JUMP_BITS[code] & 4), bool(JUMP_BITS[code] & 2), bool(JUMP_BITS[code] & 1))
+    for code in JumpCodes
+}
+
+
+@functools.cache
+def decode_c(word: int, halt: bool = False) -> Op:
+    return (
+        alu((word >> 6) & 0x3F),
+        bool(word & 0x1000),
+        bool(word & 0x20),
+        bool(word & 0x10),
+        bool(word & 0x08),
+        _JUMPS[word & 0x7],
+        halt,
+    )
+
+
+def decode(rom: typing.Sequence[int]) -> list[Op | None]:
+    """
+    Predecode `rom`, padded with None up to ROM_SIZE so running off the end
+    of the program is caught without bounds checks.
+    """
+    if len(rom) > ROM_SIZE:
+        raise Exception(f"ROM of {len(rom)} words does not fit in {ROM_SIZE}")
+    code: list[Op | None] = [None] * ROM_SIZE
+    for pc, word in enumerate(rom):
+        if word & 0x8000:
+            # Jumping back to an `@self` right before, changing nothing.
+            halt = (
+                pc > 0
+                and rom[pc - 1] == pc - 1
+                and word & 0x7 == 0x7
+                and not word & 0x38
+            )
+            code[pc] = decode_c(word, halt)
+        else:
+            code[pc] = word
+    return code
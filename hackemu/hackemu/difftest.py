@@ -0,0 +1,383 @@
+"""
+Differential testing of hackvm's code generator: random well formed VM
+programs run on hackvm.interp's Interpreter and, translated and
+assembled, on the emulator. The final stacks and RAM have to agree.
+
+Programs call only functions defined after the caller and loops count
+down from small constants, so every program halts on `label end / goto
+end`. They are generated as a tree of statements and expressions, and
+failing ones are shrunk on that tree, dropping statements and functions
+and turning expressions into constants, which keeps them well formed.
+
+Needs hackvm, `pip install hackemu[difftest]`.
+"""
+
+import contextlib
+import dataclasses
+import os
+import pathlib
+import random
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+from hackass.assembler import assemble_words
+from hackvm.interp import STACK_START, Interpreter
+from hackvm.translator import Translator
+
+from .machine import Machine
+
+NAME = "Main"
+# Memory `member`, `this` and `static` accesses point into, well above
+# any stack the programs build.
+SCRATCH = 1000
+SCRATCH_WORDS = 64
+# Free registers, which only the translation uses.
+FREE = range(13, 16)
+CYCLES_PER_STEP = 200
+LOOP_DEPTH = 2
+
+
+class Invalid(Exception):
+    "The program is not one both sides have to agree on."
+
+
+@dataclasses.dataclass(slots=True)
+class Node:
+    """
+    Part of a generated program: a statement ("stmt"), which leaves the
+    stack as it was, an expression ("expr"), which pushes one value, a
+    function ("func") or a value left on the stack at the end ("result").
+    """
+
+    kind: str
+    parts: list["str | Node"] = dataclasses.field(default_factory=list)
+
+    def lines(self) -> typing.Iterator[str]:
+        for part in self.parts:
+            if isinstance(part, str):
+                yield part
+            else:
+                yield from part.lines()
+
+    def render(self) -> str:
+        return "\n".join(self.lines()) + "\n"
+
+
+class Generator:
+    """
+    Emits one random program. Expressions push exactly one value and
+    statements leave the stack as they found it, so any mix of them is
+    stack balanced.
+    """
+
+    def __init__(self, rng: random.Random, size: int = 20):
+        self.rng = rng
+        self.size = size
+        self.root = Node("program")
+        self.parts = self.root.parts
+        self.labels = 0
+        self.funcs: list[tuple[int, int, bool]] = []  # nargs, nlocals, method
+        self.current = -1  # index of the function being emitted, -1 at top level
+        self.loops = 0
+
+    def emit(self, *lines: str):
+        self.parts.extend(lines)
+
+    @contextlib.contextmanager
+    def node(self, kind: str):
+        "Emit into a new node of `kind` for the duration."
+        node = Node(kind)
+        self.parts.append(node)
+        parts, self.parts = self.parts, node.parts
+        try:
+            yield node
+        finally:
+            self.parts = parts
+
+    def label(self) -> str:
+        self.labels += 1
+        return f"L{self.labels}"
+
+    def pointer(self) -> int:
+        return SCRATCH + self.rng.randrange(SCRATCH_WORDS // 2)
+
+    def expr(self, depth: int):
+        with self.node("expr"):
+            self._expr(depth)
+
+    def _expr(self, depth: int):
+        rng = self.rng
+        choice = rng.randrange(10) if depth > 0 else rng.randrange(3)
+        nargs, nlocals, method = self.funcs[self.current] if self.current >= 0 else (0, 0, False)
+        if choice == 0 or choice == 1:
+            value = rng.choice([0, 1, 2, 3, rng.randrange(100), rng.randrange(0x8000)])
+            self.emit(f"push constant {value}")
+        elif choice == 2:
+            segments = ["temp"]
+            if nargs:
+                segments.append("argument")
+            if nlocals:
+                segments.append("local")
+            if method:
+                segments.append("this")
+            match rng.choice(segments):
+                case "temp":
+                    # `push temp i` pushes the slot's address.
+                    self.emit(f"push temp {rng.randrange(1, 8)}", "push member 0")
+                case "argument":
+                    self.emit(f"push argument {rng.randrange(nargs)}")
+                case "local":
+                    self.emit(f"push local {rng.randrange(nlocals)}")
+                case "this":
+                    self.emit(f"push this {rng.randrange(SCRATCH_WORDS // 2)}")
+        elif choice <= 5:
+            self.expr(depth - 1)
+            self.expr(depth - 1)
+            self.emit(rng.choice(["add", "sub", "and", "or", "eq", "lt", "gt"]))
+        elif choice == 6:
+            self.expr(depth - 1)
+            self.emit(rng.choice(["neg", "not"]))
+        elif choice == 7:
+            self.emit(f"push constant {self.pointer()}", f"push member {rng.randrange(SCRATCH_WORDS // 2)}")
+        else:
+            callees = range(self.current + 1, len(self.funcs))
+            if not callees:
+                return self._expr(0)
+            callee = rng.choice(callees)
+            c_nargs, _, c_method = self.funcs[callee]
+            for i in range(c_nargs):
+                if i == 0 and c_method:
+                    self.emit(f"push constant {self.pointer()}")
+                else:
+                    self.expr(depth - 1)
+            if rng.randrange(4):
+                self.emit(f"call F{callee} {c_nargs}")
+            else:
+                self.emit(f"push F{callee}", f"call {c_nargs}")
+
+    def statement(self, depth: int):
+        with self.node("stmt"):
+            self._statement(depth)
+
+    def _statement(self, depth: int):
+        rng = self.rng
+        nargs, nlocals, method = self.funcs[self.current] if self.current >= 0 else (0, 0, False)
+        choice = rng.randrange(8) if depth > 0 else rng.randrange(5)
+        if choice <= 1:
+            self.expr(2)
+            targets = [f"temp {rng.randrange(1, 6)}", f"static {SCRATCH + SCRATCH_WORDS // 2 + rng.randrange(16)}"]
+            if nlocals:
+                targets.append(f"local {rng.randrange(nlocals)}")
+            if nargs > method:
+                targets.append(f"argument {rng.randrange(int(method), nargs)}")
+            if method:
+                targets.append(f"this {rng.randrange(SCRATCH_WORDS // 2)}")
+            self.emit(f"pop {rng.choice(targets)}")
+        elif choice == 2:
+            self.expr(2)
+            self.emit(f"push constant {self.pointer()}", f"pop member {rng.randrange(SCRATCH_WORDS // 2)}")
+        elif choice <= 4:
+            self.expr(2)
+            self.emit("pop temp 5")
+        elif choice <= 6:
+            then, end = self.label(), self.label()
+            self.expr(2)
+            self.emit(f"if-goto {then}")
+            self.block(depth - 1)
+            self.emit(f"goto {end}", f"label {then}")
+            self.block(depth - 1)
+            self.emit(f"label {end}")
+        elif self.loops < LOOP_DEPTH:
+            # Counters live in temp 6 and 7 at top level and in locals past
+            # the ones statements use in functions, where nothing else writes.
+            if self.current < 0:
+                counter = f"temp {6 + self.loops}"
+                load = (f"push {counter}", "push member 0")
+            else:
+                counter = f"local {nlocals + self.loops}"
+                load = (f"push {counter}",)
+            top, end = self.label(), self.label()
+            self.emit(f"push constant {rng.randrange(5)}", f"pop {counter}", f"label {top}")
+            self.emit(*load, "push constant 0", "eq", f"if-goto {end}")
+            self.loops += 1
+            self.block(depth - 1)
+            self.loops -= 1
+            self.emit("push constant 1", *load, "sub", f"pop {counter}")
+            self.emit(f"goto {top}", f"label {end}")
+
+    def block(self, depth: int):
+        for _ in range(self.rng.randrange(1, 4)):
+            self.statement(depth)
+
+    def program(self) -> Node:
+        rng = self.rng
+        for _ in range(rng.randrange(5)):
+            method = rng.randrange(3) == 0
+            self.funcs.append((rng.randrange(int(method), 4), rng.randrange(4), method))
+        self.current = -1
+        for _ in range(max(1, self.size // 4)):
+            self.statement(2)
+        for _ in range(rng.randrange(1, 4)):
+            with self.node("result"):
+                self.expr(3)
+        self.emit("label end", "goto end")
+        for i, (_, nlocals, _) in enumerate(self.funcs):
+            self.current = i
+            with self.node("func"):
+                self.emit(f"function F{i} {nlocals + LOOP_DEPTH}")
+                for _ in range(rng.randrange(self.size // 4 + 1)):
+                    self.statement(2)
+                self.expr(3)
+                self.emit("return")
+        return self.root
+
+
+def generate(seed: int, size: int = 20) -> Node:
+    return Generator(random.Random(seed), size).program()
+
+
+def interpret(program: str, max_steps: int) -> Interpreter:
+    interp = Interpreter()
+    try:
+        interp.load(NAME, program)
+        interp.run(max_steps)
+    except Exception as e:
+        raise Invalid(f"interpreter: {e}") from e
+    if not interp.halted:
+        raise Invalid(f"interpreter did not halt in {max_steps} steps")
+    if interp.frames:
+        raise Invalid("interpreter halted inside a call")
+    if interp.ram[0] < STACK_START:
+        raise Invalid("stack underflow")
+    return interp
+
+
+def emulate(program: str, max_cycles: int) -> Machine:
+    words = assemble_words("\n".join(Translator().translate(NAME, program)), fast=True)
+    machine = Machine(words)
+    machine.run(max_cycles)
+    return machine
+
+
+def compare(interp: Interpreter, machine: Machine) -> str | None:
+    "What differs between the two final states, None if nothing does."
+    if not machine.halted:
+        return "emulation did not halt"
+    ram = machine.ram
+    for addr in range(STACK_START):
+        if addr not in FREE and interp.ram[addr] != ram[addr]:
+            return f"RAM[{addr}]: interpreter {interp.ram[addr]}, emulator {ram[addr]}"
+    stack = list(ram[STACK_START : ram[0]])
+    if interp.stack != stack:
+        return f"stack: interpreter {interp.stack}, emulator {stack}"
+    for addr in range(SCRATCH, len(ram)):
+        if interp.ram[addr] != ram[addr]:
+            return f"RAM[{addr}]: interpreter {interp.ram[addr]}, emulator {ram[addr]}"
+    return None
+
+
+def check(program: str, max_steps: int = 1_000_000) -> str | None:
+    """
+    Run `program` both ways, returning what differs or None when they
+    agree. Raises Invalid for programs the interpreter does not finish.
+    """
+    interp = interpret(program, max_steps)
+    try:
+        machine = emulate(program, interp.steps * CYCLES_PER_STEP + 1000)
+    except Exception as e:
+        return f"translation: {e}"
+    return compare(interp, machine)
+
+
+def _fails(program: Node) -> bool:
+    try:
+        return check(program.render()) is not None
+    except Invalid:
+        return False
+
+
+def _edits(node: Node) -> typing.Iterator[tuple[Node, int, Node | None]]:
+    "Every (parent, index, replacement) that makes `node` smaller, outermost first."
+    for i, part in enumerate(node.parts):
+        if isinstance(part, str):
+            continue
+        if part.kind in ("stmt", "func", "result"):
+            yield node, i, None
+        elif part.kind == "expr" and part.parts != ["push constant 0"]:
+            yield node, i, Node("expr", ["push constant 0"])
+    for part in node.parts:
+        if not isinstance(part, str):
+            yield from _edits(part)
+
+
+def shrink(program: Node) -> Node:
+    """
+    Drop statements, functions and results from a failing `program` and
+    replace expressions by constants, one at a time, for as long as what
+    is left still fails. Edits are made in place.
+    """
+    progress = True
+    while progress:
+        progress = False
+        for parent, i, replacement in _edits(program):
+            part = parent.parts[i]
+            if replacement is None:
+                del parent.parts[i]
+            else:
+                parent.parts[i] = replacement
+            if _fails(program):
+                progress = True
+                break
+            if replacement is None:
+                parent.parts.insert(i, part)
+            else:
+                parent.parts[i] = part
+    return program
+
+
+@dataclasses.dataclass(slots=True)
+class Failure:
+    seed: int
+    reason: str
+    program: str
+
+
+def run_case(seed: int, size: int = 20, minimize: bool = True) -> Failure | None:
+    program = generate(seed, size)
+    try:
+        reason = check(program.render())
+    except Invalid as e:
+        return Failure(seed, f"generated an invalid program, {e}", program.render())
+    if reason is None:
+        return None
+    if minimize:
+        program = shrink(program)
+        reason = check(program.render()) or reason
+    return Failure(seed, reason, program.render())
+
+
+def run_cases(
+    seeds: typing.Iterable[int],
+    size: int = 20,
+    minimize: bool = True,
+    workers: int | None = None,
+) -> typing.Iterator[Failure]:
+    "Check every seed's program across a process pool, yielding the failures."
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results: typing.Iterable[Failure | None] = (run_case(seed, size, minimize) for seed in seeds)
+        yield from filter(None, results)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        chunksize = max(1, len(seeds) // (workers * 8))
+        results = pool.map(run_case, seeds, [size] * len(seeds), [minimize] * len(seeds), chunksize=chunksize)
+        yield from filter(None, results)
+
+
+def write_failure(failure: Failure, directory: pathlib.Path) -> pathlib.Path:
+    "Save the repro as a .vm file named after its seed."
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"Seed{failure.seed}.vm"
+    path.write_text(f"// {failure.reason}\n{failure.program}")
+    return path
@@ -0,0 +1,196 @@
+"""
+A test farm: suites of Hack programs run across a process pool, each case
+setting up RAM, running its ROM and checking RAM afterwards.
+
+The parent assembles or loads every ROM once and packs the words into one
+block of multiprocessing.shared_memory, which the workers map read-only,
+so worker count does not multiply ROM memory. Decoded instructions are
+Python objects and cannot live there; each worker decodes a ROM the first
+time it runs it and shares the result between all of its cases, the op
+tuples themselves shared between ROMs through decode_c's cache.
+
+A suite is a JSON list of cases:
+
+    {"name": "Add", "rom": "Add.asm", "set": ["0=2", "1=3"],
+     "expect": ["2=5"], "cycles": 1000}
+
+with ROM paths relative to the suite, "set" and "expect" in hemu's
+ADDR=VALUE form and "name", "set" and "cycles" optional. Values are 16-bit
+words, 65535 and -1 alike. A case passes when its ROM halts within the
+cycles and RAM holds what it expects; one raising an error fails.
+"""
+
+import dataclasses
+import json
+import os
+import pathlib
+import typing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .decode import RAM_SIZE, Op, decode
+from .machine import Machine
+from .parsing import parse_assignment
+
+DEFAULT_CYCLES = 10_000_000
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Case:
+    name: str
+    rom: str
+    set: tuple[tuple[int, int], ...] = ()
+    expect: tuple[tuple[int, int], ...] = ()
+    cycles: int = DEFAULT_CYCLES
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Result:
+    case: Case
+    cycles: int
+    halted: bool
+    mismatches: tuple[tuple[int, int, int], ...]  # address, expected, actual
+    error: str | None = None
+
+    @property
+    def passed(self) -> bool:
+        return self.halted and not self.mismatches and self.error is None
+
+
+def _ram_assignment(spec: str) -> tuple[int, int]:
+    "ADDR=VALUE with the value as the signed word RAM holds."
+    addr, value = parse_assignment(spec)
+    if not 0 <= addr < RAM_SIZE:
+        raise Exception(f"Address {addr} in {spec!r} is outside RAM")
+    if not -0x8000 <= value <= 0xFFFF:
+        raise Exception(f"Value {value} in {spec!r} does not fit in 16 bits")
+    return addr, (value + 0x8000 & 0xFFFF) - 0x8000
+
+
+def load_suite(path: str | os.PathLike) -> list[Case]:
+    "Read a suite, resolving ROM paths against its directory."
+    path = pathlib.Path(path)
+    base = path.parent
+    cases: list[Case] = []
+    for i, spec in enumerate(json.loads(path.read_text())):
+        if "rom" not in spec:
+            raise Exception(f"Case {i} of {path!s} names no rom")
+        rom = base / spec["rom"]
+        cases.append(
+            Case(
+                spec.get("name", f"{rom.stem}#{i}"),
+                str(rom),
+                tuple(map(_ram_assignment, spec.get("set", ()))),
+                tuple(map(_ram_assignment, spec.get("expect", ()))),
+                spec.get("cycles", DEFAULT_CYCLES),
+            )
+        )
+    return cases
+
+
+def _load_rom(path: str) -> array:
+    if path.endswith(".asm"):
+        from hackass.assembler import assemble_words
+
+        return array("H", assemble_words(pathlib.Path(path).read_text(), fast=True))
+    from hackass.rom import load
+
+    return array("H", load(path))
+
+
+class SharedROMs:
+    """
+    The ROMs at `paths` packed into a shared memory block, which the
+    creating process owns and has to close().
+    """
+
+    __slots__ = "memory", "index"
+
+    def __init__(self, paths: typing.Iterable[str]):
+        roms = {path: _load_rom(path) for path in dict.fromkeys(paths)}
+        self.index: dict[str, tuple[int, int]] = {}
+        offset = 0
+        for path, words in roms.items():
+            self.index[path] = offset, len(words)
+            offset += len(words)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(2 * offset, 1))
+        words = memoryview(self.memory.buf).cast("H")
+        for path, rom in roms.items():
+            start, count = self.index[path]
+            words[start : start + count] = rom
+        words.release()
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Worker state, set up by _attach.
+_memory: shared_memory.SharedMemory | None = None
+_index: dict[str, tuple[int, int]] = {}
+_decoded: dict[str, tuple[memoryview, list[Op | None]]] = {}
+
+
+def _attach(memory: shared_memory.SharedMemory | None, index: dict[str, tuple[int, int]]):
+    global _memory, _index
+    # Views left into a block keep it from being closed.
+    for words, _ in _decoded.values():
+        words.release()
+    _decoded.clear()
+    _memory, _index = memory, index
+
+
+def _open(name: str, index: dict[str, tuple[int, int]]):
+    # Pool workers share the parent's resource tracker, which sees the
+    # block unlinked once by SharedROMs.close.
+    _attach(shared_memory.SharedMemory(name=name), index)
+
+
+def _program(path: str) -> tuple[memoryview, list[Op | None]]:
+    if path not in _decoded:
+        assert _memory is not None
+        start, count = _index[path]
+        words = memoryview(_memory.buf).cast("H")[start : start + count].toreadonly()
+        _decoded[path] = words, decode(words)
+    return _decoded[path]
+
+
+def run_case(case: Case) -> Result:
+    "Run `case` on the ROMs the worker attached to, an error failing it."
+    machine = None
+    try:
+        words, code = _program(case.rom)
+        machine = Machine(words, code)
+        for addr, value in case.set:
+            machine.ram[addr] = value
+        machine.run(case.cycles)
+        mismatches = tuple(
+            (addr, value, machine.ram[addr]) for addr, value in case.expect if machine.ram[addr] != value
+        )
+        return Result(case, machine.cycles, machine.halted, mismatches)
+    except Exception as e:
+        cycles = 0 if machine is None else machine.cycles
+        return Result(case, cycles, False, (), f"{type(e).__name__}: {e}")
+
+
+def run_suite(cases: typing.Sequence[Case], workers: int | None = None) -> typing.Iterator[Result]:
+    "Run `cases` across a process pool, yielding their results in order."
+    workers = workers or os.cpu_count() or 1
+    with SharedROMs(case.rom for case in cases) as roms:
+        if workers == 1:
+            _attach(roms.memory, roms.index)
+            try:
+                yield from map(run_case, cases)
+            finally:
+                _attach(None, {})
+            return
+        with ProcessPoolExecutor(workers, initializer=_open, initargs=(roms.memory.name, roms.index)) as pool:
+            chunksize = max(1, len(cases) // (workers * 8))
+            yield from pool.map(run_case, cases, chunksize=chunksize)
@@ -0,0 +1,165 @@
+"""
+Superinstructions: short straight-line runs of ROM words that code from
+hackvm's CodeGen repeats all over, like `@SP / AM=M-1 / D=M`, each run by
+one generated handler instead of one interpreter dispatch per word.
+
+A pattern is the tuple of words it fuses. Handlers are compiled once per
+pattern and shared by every site where it occurs; only the first word of
+a site is replaced, so jumping into the middle of one still works.
+"""
+
+import collections
+import dataclasses
+import itertools
+import typing
+
+from .blocks import BlockFn, compile_block
+from .decode import ADDR_MASK
+from .machine import Machine
+
+Pattern = tuple[int, ...]
+
+NGRAM_SIZES = (2, 3, 4)
+MIN_SITES = 4
+MAX_PATTERNS = 64
+
+
+class Fused(typing.NamedTuple):
+    handler: BlockFn
+    length: int
+
+
+def fusible(word: int) -> bool:
+    "Words that can sit in a pattern: anything but a jump."
+    return not word & 0x8000 or not word & 0x7
+
+
+def ngram_sites(rom: typing.Sequence[int], sizes: typing.Iterable[int] = NGRAM_SIZES) -> dict[Pattern, list[int]]:
+    "Where each jump free run of `sizes` words starts in `rom`."
+    sites: dict[Pattern, list[int]] = collections.defaultdict(list)
+    for n in sizes:
+        for pc in range(len(rom) - n + 1):
+            pattern = tuple(rom[pc : pc + n])
+            if all(map(fusible, pattern)):
+                sites[pattern].append(pc)
+    return sites
+
+
+@dataclasses.dataclass(slots=True)
+class NGram:
+    pattern: Pattern
+    sites: list[int]
+    executions: int = 0
+
+    @property
+    def saved(self) -> int:
+        "Interpreter dispatches fusing it saves."
+        return self.executions * (len(self.pattern) - 1)
+
+
+def ngram_profile(
+    rom: typing.Sequence[int],
+    counts: typing.Sequence[int] | None = None,
+    sizes: typing.Iterable[int] = NGRAM_SIZES,
+) -> list[NGram]:
+    """
+    Candidate patterns, best first: by dispatches saved on the workload
+    `counts` came from, leaving out ones it never ran, or by number of
+    sites without one.
+    """
+    grams = [NGram(pattern, sites) for pattern, sites in ngram_sites(rom, sizes).items()]
+    if counts is None:
+        grams.sort(key=lambda g: (len(g.sites) * (len(g.pattern) - 1), len(g.pattern)), reverse=True)
+        return grams
+    for gram in grams:
+        gram.executions = sum(counts[pc] for pc in gram.sites)
+    grams = [gram for gram in grams if gram.executions]
+    grams.sort(key=lambda g: (g.saved, len(g.pattern)), reverse=True)
+    return grams
+
+
+def select(
+    profile: typing.Iterable[NGram], limit: int = MAX_PATTERNS, min_sites: int = MIN_SITES
+) -> list[Pattern]:
+    "The first `limit` patterns occurring at least `min_sites` times."
+    chosen = (gram.pattern for gram in profile if len(gram.sites) >= min_sites)
+    return list(itertools.islice(chosen, limit))
+
+
+class FusedMachine(Machine):
+    """
+    Machine whose code has superinstructions spliced in. Without `patterns`
+    the most common ones in the ROM are picked; pass
+    select(ngram_profile(rom, counts), min_sites=1) to fuse what a profiled
+    run executed most instead.
+    """
+
+    __slots__ = ("plain",)
+
+    def __init__(self, rom: typing.Iterable[int], patterns: typing.Iterable[Pattern] | None = None):
+        super().__init__(rom)
+        self.plain = self.code
+        if patterns is None:
+            patterns = select(ngram_profile(self.rom))
+        self.fuse(patterns)
+
+    def fuse(self, patterns: typing.Iterable[Pattern]):
+        "Splice in `patterns`, preferring the longest one at every address."
+        handlers = {pattern: Fused(compile_block(pattern, 0)[0], len(pattern)) for pattern in patterns}
+        sizes = sorted({len(pattern) for pattern in handlers}, reverse=True)
+        code = list(self.plain)
+        rom = self.rom
+        pc = 0
+        while pc < len(rom):
+            for n in sizes:
+                if (fused := handlers.get(tuple(rom[pc : pc + n]))) is not None:
+                    code[pc] = fused
+                    pc += n
+                    break
+            else:
+                pc += 1
+        self.code = code
+
+    def run(self, max_cycles: int) -> int:
+        code, plain, ram = self.code, self.plain, self.ram
+        a, d, pc = self.a, self.d, self.pc
+        budget = max_cycles
+        halted = False
+        while budget:
+            op = code[pc]
+            if op.__class__ is Fused:
+                if op.length <= budget:
+                    a, d, step = op.handler(a, d, ram)
+                    budget -= op.length
+                    pc += step
+                    continue
+                op = plain[pc]
+            budget -= 1
+            if op.__class__ is int:
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                budget += 1
+                halted = True
+                break
+            alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+            r = alu(d, ram[a & ADDR_MASK] if use_m else a)
+            if dest_m:
+                ram[a & ADDR_MASK] = r
+            if jump is not None and jump[(r >= 0) + (r > 0)]:
+                if halt and a == pc - 1:
+                    halted = True
+                    break
+                pc = a & ADDR_MASK
+            else:
+                pc += 1
+            if dest_a:
+                a = r
+            if dest_d:
+                d = r
+        self.a, self.d, self.pc = a, d, pc
+        self.halted = halted
+        executed = max_cycles - budget
+        self.cycles += executed
+        return executed
@@ -0,0 +1,102 @@
+import os
+import typing
+from array import array
+
+from hackass.codes import PREDEFINED
+
+from .decode import ADDR_MASK, RAM_SIZE, Op, decode
+
+SCREEN: int = PREDEFINED["SCREEN"]
+KBD: int = PREDEFINED["KBD"]
+
+
+class Machine:
+    """
+    A Hack computer: ROM predecoded once, 32K words of RAM with the screen
+    and keyboard memory mapped at SCREEN and KBD. Machines running the same
+    ROM can share its decoded `code`, which is never modified.
+    """
+
+    __slots__ = "rom", "code", "ram", "a", "d", "pc", "cycles", "halted"
+
+    def __init__(self, rom: typing.Iterable[int], code: list[Op | None] | None = None):
+        # Buffers of words are kept, not copied, so machines can run a ROM
+        # in shared memory. The ROM is only ever read.
+        if isinstance(rom, array | memoryview) and memoryview(rom).format == "H":
+            self.rom = rom
+        else:
+            self.rom = array("H", rom)
+        self.code = decode(self.rom) if code is None else code
+        self.ram = array("h", bytes(2 * RAM_SIZE))
+        self.reset()
+
+    @classmethod
+    def from_file(cls, path: str | os.PathLike):
+        "Load a .hack listing or binary ROM image."
+        from hackass.rom import load
+
+        return cls(load(path))
+
+    def reset(self):
+        "Reset the CPU, RAM is left as is like the hardware's reset line."
+        self.a = self.d = self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    @property
+    def screen(self) -> memoryview:
+        return memoryview(self.ram)[SCREEN:KBD]
+
+    @property
+    def key(self) -> int:
+        return self.ram[KBD]
+
+    @key.setter
+    def key(self, code: int):
+        self.ram[KBD] = code
+
+    def run(self, max_cycles: int) -> int:
+        """
+        Execute at most `max_cycles` instructions, stopping early when the
+        program halts (spins on `(END) @END 0;JMP`) or runs off the end of ROM.
+        Returns the number of instructions executed.
+        """
+        code, ram = self.code, self.ram
+        a, d, pc = self.a, self.d, self.pc
+        budget = max_cycles
+        halted = False
+        while budget:
+            op = code[pc]
+            budget -= 1
+            if op.__class__ is int:
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                budget += 1
+                halted = True
+                break
+            alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+            r = alu(d, ram[a & ADDR_MASK] if use_m else a)
+            if dest_m:
+                ram[a & ADDR_MASK] = r
+            if jump is not None and jump[(r >= 0) + (r > 0)]:
+                if halt and a == pc - 1:
+                    halted = True
+                    break
+                pc = a & ADDR_MASK
+            else:
+                pc += 1
+            if dest_a:
+                a = r
+            if dest_d:
+                d = r
+        self.a, self.d, self.pc = a, d, pc
+        self.halted = halted
+        executed = max_cycles - budget
+        self.cycles += executed
+        return executed
+
+    def step(self) -> bool:
+        "Execute one instruction, False once the machine has halted."
+        return self.run(1) == 1 and not self.halted
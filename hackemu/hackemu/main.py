@@ -0,0 +1,413 @@
+import argparse
+import pathlib
+import sys
+import time
+
+from .parsing import parse_assignment, parse_range
+
+
+def load_rom(input_file: pathlib.Path, labels: dict[str, int] | None = None):
+    "The ROM in `input_file`, filling `labels` when it is assembly."
+    if input_file.suffix == ".asm":
+        from hackass.assembler import assemble_words
+
+        return assemble_words(input_file.read_text(), fast=True, labels=labels)
+    from hackass.rom import load
+
+    return load(input_file)
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hemu",
+        description="Run a Hack ROM (.hack, binary .rom or .asm) and dump RAM",
+    )
+    parser.add_argument("input_file", type=pathlib.Path)
+    parser.add_argument(
+        "-n",
+        "--cycles",
+        type=int,
+        default=10_000_000,
+        help="stop after this many instructions (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-s",
+        "--set",
+        metavar="ADDR=VALUE",
+        type=parse_assignment,
+        action="append",
+        default=[],
+        help="initialise RAM[ADDR] before running, repeatable",
+    )
+    parser.add_argument(
+        "-d",
+        "--dump",
+        metavar="ADDR[:END]",
+        type=parse_range,
+        action="append",
+        default=[],
+        help="print RAM[ADDR] or RAM[ADDR:END] afterwards, repeatable",
+    )
+    parser.add_argument(
+        "-b",
+        "--break",
+        dest="breakpoints",
+        metavar="ADDR|LABEL",
+        action="append",
+        default=[],
+        help="stop before executing this ROM address or label, repeatable",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        metavar="NAME|ADDR[:END]",
+        action="append",
+        default=[],
+        help="stop after a write changes RAM here, e.g. SP or 256:2048, repeatable",
+    )
+    parser.add_argument(
+        "--load-state",
+        metavar="FILE",
+        type=pathlib.Path,
+        help="start from a snapshot saved by --save-state on the same ROM",
+    )
+    parser.add_argument(
+        "--save-state",
+        metavar="FILE",
+        type=pathlib.Path,
+        help="save registers and RAM to FILE afterwards",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        type=pathlib.Path,
+        help="record the PCs and RAM writes of the run to FILE for htrace",
+    )
+    parser.add_argument(
+        "--keyframe-interval",
+        metavar="N",
+        type=int,
+        default=1_000_000,
+        help="with --trace, cycles between keyframes to seek from (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--screen",
+        metavar="FILE",
+        type=pathlib.Path,
+        help="save the screen afterwards as PNG, or PBM when FILE ends in .pbm",
+    )
+    engine = parser.add_mutually_exclusive_group()
+    engine.add_argument(
+        "--blocks",
+        action="store_true",
+        help="compile basic blocks to Python functions instead of interpreting",
+    )
+    engine.add_argument(
+        "--fuse",
+        action="store_true",
+        help="run frequent instruction pairs and triples as superinstructions",
+    )
+    parser.add_argument(
+        "--profile-ngrams",
+        metavar="N",
+        type=int,
+        help="count executions and report the N fusions that would save the"
+        " most dispatches on this run",
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        metavar="N",
+        type=int,
+        nargs="?",
+        const=20,
+        help="count cycles per address and print the top N (default: %(const)s)"
+        " VM functions and labels, labels need an .asm input",
+    )
+    parser.add_argument(
+        "--collapsed",
+        metavar="FILE",
+        type=pathlib.Path,
+        help="with --profile, write VM call stacks for flamegraph tools to FILE",
+    )
+    return parser
+
+
+def report_ngrams(rom, counts: list[int], limit: int):
+    from hackass.disassembler import decode_table
+
+    from .fusion import ngram_profile
+
+    names = decode_table()
+    total = sum(counts)
+    print(f"{'saved':>10} {'%':>6} {'runs':>10} {'sites':>6}  pattern")
+    for gram in ngram_profile(rom, counts)[:limit]:
+        pattern = " / ".join(names[word] for word in gram.pattern)
+        share = 100 * gram.saved / max(total, 1)
+        print(f"{gram.saved:>10} {share:>6.2f} {gram.executions:>10} {len(gram.sites):>6}  {pattern}")
+
+
+def main():
+    argparser = make_argparser()
+    args = argparser.parse_args()
+    if args.trace is not None and (args.profile is not None or args.profile_ngrams is not None):
+        argparser.error("--trace cannot be combined with -p/--profile or --profile-ngrams")
+    if (args.breakpoints or args.watch) and (
+        args.trace is not None or args.profile is not None or args.profile_ngrams is not None
+    ):
+        argparser.error("-b/-w cannot be combined with --trace, -p/--profile or --profile-ngrams")
+    if args.blocks:
+        from .blocks import BlockMachine as Machine
+    elif args.fuse:
+        from .fusion import FusedMachine as Machine
+    else:
+        from .machine import Machine
+
+    if not args.input_file.is_file():
+        print(f"Cannot find input file: {args.input_file!s}", file=sys.stderr)
+        return 2
+    labels: dict[str, int] = {}
+    machine = Machine(load_rom(args.input_file, labels))
+    if args.load_state is not None:
+        from . import snapshot
+
+        snapshot.restore(machine, snapshot.load(args.load_state))
+    for addr, value in args.set:
+        machine.ram[addr] = value
+    start = time.perf_counter()
+    if args.profile is not None or args.profile_ngrams is not None:
+        from .profile import profile_run
+
+        profile = profile_run(machine, args.cycles, labels)
+        counts = profile.counts
+        executed = machine.cycles
+    elif args.breakpoints or args.watch:
+        from .debug import Debugger
+
+        debugger = Debugger(machine, labels)
+        try:
+            for where in args.breakpoints:
+                debugger.add_breakpoint(int(where, 0) if where[:1].isdigit() else where)
+            for where in args.watch:
+                debugger.add_watchpoint(where)
+        except Exception as e:
+            argparser.error(str(e))
+        cycles = machine.cycles
+        hit = debugger.run(args.cycles)
+        executed = machine.cycles - cycles
+        if hit is not None and hit.watch:
+            print(f"watchpoint RAM[{hit.addr}] {hit.old} -> {hit.new} by PC={hit.pc}")
+        elif hit is not None:
+            print(f"breakpoint at PC={hit.pc}")
+    elif args.trace is not None:
+        from .trace import Recorder
+
+        with open(args.trace, "wb") as f:
+            recorder = Recorder(machine, f, args.keyframe_interval)
+            executed = recorder.run(args.cycles)
+            recorder.flush()
+    else:
+        executed = machine.run(args.cycles)
+    seconds = time.perf_counter() - start
+    state = "halted" if machine.halted else "stopped"
+    print(
+        f"{state} after {executed} cycles in {seconds:.3f}s"
+        f" ({executed / max(seconds, 1e-9) / 1e6:.2f} MIPS)"
+    )
+    print(f"A={machine.a} D={machine.d} PC={machine.pc}")
+    for where in args.dump:
+        for addr in where:
+            print(f"RAM[{addr}]={machine.ram[addr]}")
+    if args.save_state is not None:
+        from . import snapshot
+
+        with open(args.save_state, "wb") as f:
+            snapshot.dump(snapshot.take(machine), f)
+    if args.screen is not None:
+        from . import screen
+
+        screen.save(screen.Framebuffer(machine).bitmap, args.screen)
+    if args.profile is not None:
+        print(profile.report(labels, args.profile), end="")
+        if args.collapsed is not None:
+            args.collapsed.write_text(profile.collapsed())
+    if args.profile_ngrams is not None:
+        report_ngrams(machine.rom, counts, args.profile_ngrams)
+    return 0
+
+
+def make_difftest_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hvmdiff",
+        description="Run random VM programs on hackvm's interpreter and, translated and"
+        " assembled, on the emulator, reporting the ones whose results differ",
+    )
+    parser.add_argument(
+        "-n",
+        "--cases",
+        type=int,
+        default=1000,
+        help="number of programs to try (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the first program, the rest follow it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=20,
+        help="rough number of statements per program (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--no-shrink",
+        action="store_true",
+        help="report failing programs as generated instead of minimized",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="DIR",
+        type=pathlib.Path,
+        help="write each failing program to DIR/Seed<N>.vm",
+    )
+    return parser
+
+
+def difftest_main():
+    from .difftest import run_cases, write_failure
+
+    args = make_difftest_argparser().parse_args()
+    seeds = range(args.seed, args.seed + args.cases)
+    start = time.perf_counter()
+    failures = 0
+    for failure in run_cases(seeds, args.size, not args.no_shrink, args.jobs):
+        failures += 1
+        print(f"seed {failure.seed}: {failure.reason}")
+        if args.output is not None:
+            print(f"  written to {write_failure(failure, args.output)!s}")
+        else:
+            print("  " + failure.program.replace("\n", "\n  ").rstrip())
+    seconds = time.perf_counter() - start
+    print(f"{failures} of {args.cases} programs differ ({seconds:.1f}s)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def make_trace_argparser():
+    parser = argparse.ArgumentParser(
+        prog="htrace",
+        description="Replay a trace recorded by hemu --trace up to a cycle and dump RAM",
+    )
+    parser.add_argument("trace_file", type=pathlib.Path)
+    parser.add_argument(
+        "-c",
+        "--cycle",
+        type=int,
+        default=sys.maxsize,
+        help="seek to the state after this many instructions (default: the end)",
+    )
+    parser.add_argument(
+        "-d",
+        "--dump",
+        metavar="ADDR[:END]",
+        type=parse_range,
+        action="append",
+        default=[],
+        help="print RAM[ADDR] or RAM[ADDR:END] there, repeatable",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        metavar="N",
+        type=int,
+        default=0,
+        help="print the PC and RAM write of the N instructions from there on",
+    )
+    return parser
+
+
+def trace_main():
+    from .trace import Replayer
+
+    args = make_trace_argparser().parse_args()
+    if not args.trace_file.is_file():
+        print(f"Cannot find trace file: {args.trace_file!s}", file=sys.stderr)
+        return 2
+    with Replayer(args.trace_file) as replayer:
+        cycle = replayer.seek(args.cycle)
+        state = "halted" if replayer.halted else "running"
+        print(f"{state} at cycle {cycle}, {len(replayer.segments)} keyframes")
+        print(f"PC={replayer.pc}")
+        for where in args.dump:
+            for addr in where:
+                print(f"RAM[{addr}]={replayer.ram[addr]}")
+        if args.list:
+            for cycle, pc, write in replayer.steps(cycle, cycle + args.list):
+                line = f"{cycle:>12} {pc:>6}"
+                if write is not None:
+                    line += f"  RAM[{write[0]}]={write[1]}"
+                print(line)
+    return 0
+
+
+def make_farm_argparser():
+    parser = argparse.ArgumentParser(
+        prog="hfarm",
+        description="Run a JSON suite of Hack test cases across a process pool",
+    )
+    parser.add_argument("suite_file", type=pathlib.Path)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="print passing cases too",
+    )
+    return parser
+
+
+def farm_main():
+    from .farm import load_suite, run_suite
+
+    args = make_farm_argparser().parse_args()
+    if not args.suite_file.is_file():
+        print(f"Cannot find suite file: {args.suite_file!s}", file=sys.stderr)
+        return 2
+    cases = load_suite(args.suite_file)
+    start = time.perf_counter()
+    failed = cycles = 0
+    for result in run_suite(cases, args.jobs):
+        cycles += result.cycles
+        if result.passed:
+            if args.verbose:
+                print(f"PASS {result.case.name} in {result.cycles} cycles")
+            continue
+        failed += 1
+        if result.error is not None:
+            print(f"FAIL {result.case.name}, {result.error} after {result.cycles} cycles")
+            continue
+        state = "halted" if result.halted else "did not halt"
+        print(f"FAIL {result.case.name}, {state} after {result.cycles} cycles")
+        for addr, expected, actual in result.mismatches:
+            print(f"  RAM[{addr}]={actual}, expected {expected}")
+    seconds = time.perf_counter() - start
+    print(
+        f"{len(cases) - failed} passed, {failed} failed, {cycles} cycles in {seconds:.1f}s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
@@ -0,0 +1,17 @@
+"""
+The ADDR=VALUE and ADDR[:END] forms hemu's options and hfarm's suites
+share.
+"""
+
+
+def parse_range(spec: str) -> range:
+    "ADDR or START:END, as decimal or 0x hex"
+    start, _, end = spec.partition(":")
+    first = int(start, 0)
+    return range(first, int(end, 0) if end else first + 1)
+
+
+def parse_assignment(spec: str) -> tuple[int, int]:
+    "ADDR=VALUE"
+    addr, _, value = spec.partition("=")
+    return int(addr, 0), int(value, 0)
@@ -0,0 +1,180 @@
+"""
+Cycle profiling: instructions executed per ROM address, summed up by the
+labels the assembler resolved and by the VM functions hackvm's CodeGen
+emitted, plus call stacks in the collapsed format flamegraph tools read.
+VM functions are found by hackvm.codegen's label suffixes, so only with
+hackvm installed.
+
+Profiling runs an instrumented copy of the interpreter loop, so
+Machine.run pays nothing for it.
+"""
+
+import bisect
+import collections
+import dataclasses
+import typing
+
+from .decode import ADDR_MASK, decode
+from .machine import Machine
+
+TOP = "<top>"
+
+
+def _codegen():
+    "hackvm.codegen, whose label suffixes tell VM functions and helpers, or None."
+    try:
+        from hackvm import codegen
+    except ImportError:
+        return None
+    return codegen
+
+
+def vm_functions(labels: dict[str, int]) -> dict[str, int]:
+    """
+    The addresses of the VM functions among `labels`, told from other
+    labels by the body label CodeGen puts after each prologue.
+    """
+    if (codegen := _codegen()) is None:
+        return {}
+    suffix = codegen.BODY_SUFFIX
+    functions: dict[str, int] = {}
+    for label in labels:
+        if label.endswith(suffix) and (name := label[: -len(suffix)]) in labels:
+            functions[name] = labels[name]
+    return functions
+
+
+def vm_sections(labels: dict[str, int]) -> dict[str, int]:
+    "VM functions and the helpers they share, which own the code up to the next one."
+    sections = vm_functions(labels)
+    if (codegen := _codegen()) is not None:
+        helpers = codegen.CALL_SUFFIX, codegen.RETURN_SUFFIX, codegen.FUNCTION_SUFFIX
+        sections.update((label, addr) for label, addr in labels.items() if label.endswith(helpers))
+    return sections
+
+
+def aggregate(counts: typing.Sequence[int], starts: dict[str, int]) -> collections.Counter[str]:
+    """
+    Sum `counts` by the name in `starts` each address follows, TOP before
+    any. Names starting at the same address are reported together.
+    """
+    names: dict[int, list[str]] = collections.defaultdict(list)
+    for name, addr in starts.items():
+        names[addr].append(name)
+    addrs = sorted(names)
+    joined = [", ".join(names[addr]) for addr in addrs]
+    totals: collections.Counter[str] = collections.Counter()
+    for pc, count in enumerate(counts):
+        if count:
+            i = bisect.bisect_right(addrs, pc) - 1
+            totals[joined[i] if i >= 0 else TOP] += count
+    return totals
+
+
+@dataclasses.dataclass(slots=True)
+class Profile:
+    counts: list[int]
+    stacks: collections.Counter[tuple[str, ...]] = dataclasses.field(default_factory=collections.Counter)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def inclusive(self) -> collections.Counter[str]:
+        "Cycles spent in each function and everything it called."
+        totals: collections.Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            for name in set(stack):
+                totals[name] += count
+        return totals
+
+    def collapsed(self) -> str:
+        "One `caller;callee cycles` line per call stack."
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.stacks.items()) if count)
+
+    def report(self, labels: dict[str, int], limit: int = 20) -> str:
+        "Flat profiles by VM function, when there are any, and by label."
+        total = max(self.total, 1)
+        lines: list[str] = []
+        if functions := vm_sections(labels):
+            inclusive = self.inclusive()
+            lines.append(f"{'self':>12} {'%':>6} {'total':>12} {'%':>6}  function")
+            for name, count in aggregate(self.counts, functions).most_common(limit):
+                incl = inclusive.get(name, count)
+                lines.append(
+                    f"{count:>12} {100 * count / total:>6.2f} {incl:>12} {100 * incl / total:>6.2f}  {name}"
+                )
+            lines.append("")
+        lines.append(f"{'self':>12} {'%':>6}  label")
+        for name, count in aggregate(self.counts, labels).most_common(limit):
+            lines.append(f"{count:>12} {100 * count / total:>6.2f}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+def profile_run(machine: Machine, max_cycles: int, labels: dict[str, int] | None = None) -> Profile:
+    """
+    Run `machine` like Machine.run, counting how often each address
+    executes and, given the program's labels, how many cycles each VM call
+    stack took. Calls are seen as jumps to a function's label and returns
+    as jumps to CodeGen's return helper. The ROM is decoded afresh, the
+    machine's code may hold fused or compiled ops.
+    """
+    frames: dict[int, str | None] = {}
+    for name, addr in vm_functions(labels or {}).items():
+        frames[addr] = name
+    if (codegen := _codegen()) is not None:
+        for label, addr in (labels or {}).items():
+            if label.endswith(codegen.RETURN_SUFFIX):
+                frames[addr] = None
+    code, ram = decode(machine.rom), machine.ram
+    counts = [0] * len(code)
+    stacks: collections.Counter[tuple[str, ...]] = collections.Counter()
+    stack: tuple[str, ...] = (TOP,)
+    a, d, pc = machine.a, machine.d, machine.pc
+    budget = last = max_cycles
+    halted = False
+    while budget:
+        op = code[pc]
+        budget -= 1
+        counts[pc] += 1
+        if op.__class__ is int:
+            a = op
+            pc += 1
+            continue
+        if op is None:
+            budget += 1
+            counts[pc] -= 1
+            halted = True
+            break
+        alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+        r = alu(d, ram[a & ADDR_MASK] if use_m else a)
+        if dest_m:
+            ram[a & ADDR_MASK] = r
+        if jump is not None and jump[(r >= 0) + (r > 0)]:
+            if halt and a == pc - 1:
+                halted = True
+                break
+            pc = a & ADDR_MASK
+            if pc in frames:
+                stacks[stack] += last - budget
+                last = budget
+                if (name := frames[pc]) is not None:
+                    stack += (name,)
+                elif len(stack) > 1:
+                    stack = stack[:-1]
+        else:
+            pc += 1
+        if dest_a:
+            a = r
+        if dest_d:
+            d = r
+    stacks[stack] += last - budget
+    machine.a, machine.d, machine.pc = a, d, pc
+    machine.halted = halted
+    machine.cycles += max_cycles - budget
+    return Profile(counts, stacks)
+
+
+def count_executions(machine: Machine, max_cycles: int) -> list[int]:
+    "How often each address executes running `machine` for `max_cycles`."
+    return profile_run(machine, max_cycles).counts
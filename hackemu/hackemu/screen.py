@@ -0,0 +1,110 @@
+"""
+A headless display for the screen memory mapped at SCREEN: 256 rows of
+32 words, the low bit of each word the leftmost of its 16 pixels and a
+set bit black.
+
+Framebuffer keeps the screen words it last rendered and, on every frame,
+compares them with RAM a row at a time, so only the rows the program
+touched are unpacked into its bitmap. Bitmaps are uint8 arrays of shape
+[HEIGHT, WIDTH] holding 1 for black, and export to PBM or PNG without
+further dependencies.
+
+Needs numpy, `pip install hackemu[screen]`.
+"""
+
+import os
+import pathlib
+import struct
+import zlib
+
+import numpy as np
+
+from .machine import KBD, SCREEN, Machine
+
+WIDTH = 512
+HEIGHT = 256
+ROW_WORDS = WIDTH // 16
+
+Bitmap = np.ndarray
+
+
+def unpack(words: np.ndarray) -> Bitmap:
+    "Pixels of rows of screen `words`, shape [rows, ROW_WORDS] to [rows, WIDTH]."
+    data = np.ascontiguousarray(words, dtype="<u2").view(np.uint8)
+    return np.unpackbits(data, axis=-1, bitorder="little")
+
+
+class Framebuffer:
+    """
+    The screen of `machine`, rendered on demand. `bitmap` holds the last
+    frame and `words` the screen words it was rendered from.
+    """
+
+    __slots__ = "screen", "words", "bitmap", "frames"
+
+    def __init__(self, machine: Machine):
+        ram = np.frombuffer(machine.ram, dtype=np.int16)
+        self.screen = ram[SCREEN:KBD].reshape(HEIGHT, ROW_WORDS)
+        self.words = self.screen.copy()
+        self.bitmap = unpack(self.words)
+        self.frames = 0
+
+    def changed(self) -> np.ndarray:
+        "Mask of the screen words written with a new value since the last frame."
+        return self.screen != self.words
+
+    def dirty(self) -> np.ndarray:
+        "Indexes of the rows that changed since the last frame."
+        return np.flatnonzero(self.changed().any(axis=1))
+
+    def frame(self) -> np.ndarray:
+        "Render the rows that changed into `bitmap`, returning their indexes."
+        rows = self.dirty()
+        if rows.size:
+            words = self.screen[rows]
+            self.words[rows] = words
+            self.bitmap[rows] = unpack(words)
+        self.frames += 1
+        return rows
+
+
+def diff(before: Bitmap, after: Bitmap) -> tuple[int, int, int, int] | None:
+    "The (top, left, bottom, right) box, exclusive, around every pixel that differs, None when none do."
+    changed = before != after
+    rows = np.flatnonzero(changed.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(changed.any(axis=0))
+    return int(rows[0]), int(cols[0]), int(rows[-1]) + 1, int(cols[-1]) + 1
+
+
+def to_pbm(bitmap: Bitmap) -> bytes:
+    "`bitmap` as a binary (P4) PBM image, whose set bits are black too."
+    height, width = bitmap.shape
+    return b"P4\n%d %d\n" % (width, height) + np.packbits(bitmap, axis=1).tobytes()
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def to_png(bitmap: Bitmap) -> bytes:
+    "`bitmap` as a 1 bit grayscale PNG image."
+    height, width = bitmap.shape
+    # PNG grayscale has 0 for black, and every row starts with filter type 0.
+    rows = np.packbits(bitmap == 0, axis=1)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), rows)).tobytes()
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0)),
+            _chunk(b"IDAT", zlib.compress(raw)),
+            _chunk(b"IEND", b""),
+        )
+    )
+
+
+def save(bitmap: Bitmap, path: str | os.PathLike):
+    "Write `bitmap` to `path` as PNG, or PBM when it ends in .pbm."
+    path = pathlib.Path(path)
+    path.write_bytes(to_pbm(bitmap) if path.suffix.lower() == ".pbm" else to_png(bitmap))
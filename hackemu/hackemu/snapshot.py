@@ -0,0 +1,155 @@
+"""
+Machine snapshots, so a ROM booted once can be rewound to that point for
+every test instead of booting it again.
+
+RAM is kept as 256-word pages of bytes. Taking a snapshot against an
+earlier one shares every page that did not change since, and all zero
+pages share one object, so a series of snapshots costs only the pages
+each one touched. Restoring writes RAM in place, blocks compiled by
+BlockMachine keep the array they were handed.
+
+Binary layout (all fields little-endian):
+
+    magic    4s   b"HSNP"
+    version  u16  FORMAT_VERSION
+    flags    u16  bit 0: halted
+    a, d     i16  registers
+    pc       u16
+             2x   padding
+    cycles   u64
+    rom_crc  u32  CRC-32 of the ROM the snapshot was taken on
+    present  16s  bitmap of the pages that follow, the rest are zero
+    pages    512 bytes each
+"""
+
+import dataclasses
+import os
+import struct
+import sys
+import typing
+import zlib
+from array import array
+
+from .decode import RAM_SIZE
+from .machine import Machine
+
+MAGIC = b"HSNP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHhhHxxQI16s")
+HALTED = 0x1
+
+PAGE_WORDS = 256
+PAGE_BYTES = 2 * PAGE_WORDS
+PAGES = RAM_SIZE // PAGE_WORDS
+ZERO_PAGE = bytes(PAGE_BYTES)
+
+_swap = sys.byteorder != "little"
+
+
+def rom_crc(rom: array) -> int:
+    if _swap:
+        rom = array("H", rom)
+        rom.byteswap()
+    return zlib.crc32(rom)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Snapshot:
+    a: int
+    d: int
+    pc: int
+    cycles: int
+    halted: bool
+    rom_crc: int
+    pages: tuple[bytes, ...]  # PAGES pages of native 16bit words
+
+
+def take(machine: Machine, base: Snapshot | None = None) -> Snapshot:
+    "Snapshot `machine`, sharing the pages that still match `base`."
+    image = memoryview(machine.ram).cast("B").tobytes()
+    pages: list[bytes] = []
+    for i in range(PAGES):
+        page = image[i * PAGE_BYTES : (i + 1) * PAGE_BYTES]
+        if page == ZERO_PAGE:
+            page = ZERO_PAGE
+        elif base is not None and page == base.pages[i]:
+            page = base.pages[i]
+        pages.append(page)
+    crc = base.rom_crc if base is not None else rom_crc(machine.rom)
+    return Snapshot(machine.a, machine.d, machine.pc, machine.cycles, machine.halted, crc, tuple(pages))
+
+
+def restore(machine: Machine, snapshot: Snapshot, check: bool = True):
+    """
+    Put `machine` back into the state of `snapshot`, overwriting RAM in
+    place. check makes sure the snapshot was taken on the same ROM.
+    """
+    if check and rom_crc(machine.rom) != snapshot.rom_crc:
+        raise Exception("Snapshot was taken on a different ROM")
+    memoryview(machine.ram).cast("B")[:] = b"".join(snapshot.pages)
+    machine.a, machine.d, machine.pc = snapshot.a, snapshot.d, snapshot.pc
+    machine.cycles, machine.halted = snapshot.cycles, snapshot.halted
+
+
+def dumps(snapshot: Snapshot) -> bytes:
+    "Serialize `snapshot`, leaving out its zero pages."
+    present = bytearray(PAGES // 8)
+    chunks: list[bytes] = []
+    for i, page in enumerate(snapshot.pages):
+        if page == ZERO_PAGE:
+            continue
+        present[i // 8] |= 1 << (i % 8)
+        if _swap:
+            words = array("h", page)
+            words.byteswap()
+            page = words.tobytes()
+        chunks.append(page)
+    flags = HALTED if snapshot.halted else 0
+    head = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        flags,
+        snapshot.a,
+        snapshot.d,
+        snapshot.pc,
+        snapshot.cycles,
+        snapshot.rom_crc,
+        bytes(present),
+    )
+    return head + b"".join(chunks)
+
+
+def dump(snapshot: Snapshot, file: typing.BinaryIO):
+    file.write(dumps(snapshot))
+
+
+def loads(data: bytes | memoryview) -> Snapshot:
+    if len(data) < HEADER.size:
+        raise Exception("Snapshot is too short to hold a header")
+    magic, version, flags, a, d, pc, cycles, crc, present = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise Exception(f"Not a snapshot, bad magic {magic!r}")
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported snapshot format version {version}")
+    count = sum(bin(byte).count("1") for byte in present)
+    if len(data) - HEADER.size != count * PAGE_BYTES:
+        raise Exception(f"Snapshot holds {len(data) - HEADER.size} bytes of pages but header says {count} pages")
+    pages: list[bytes] = []
+    offset = HEADER.size
+    for i in range(PAGES):
+        if not present[i // 8] >> (i % 8) & 1:
+            pages.append(ZERO_PAGE)
+            continue
+        page = bytes(data[offset : offset + PAGE_BYTES])
+        offset += PAGE_BYTES
+        if _swap:
+            words = array("h", page)
+            words.byteswap()
+            page = words.tobytes()
+        pages.append(page)
+    return Snapshot(a, d, pc, cycles, bool(flags & HALTED), crc, tuple(pages))
+
+
+def load(path: str | os.PathLike) -> Snapshot:
+    with open(path, "rb") as f:
+        return loads(f.read())
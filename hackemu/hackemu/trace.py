@@ -0,0 +1,337 @@
+"""
+Execution traces: the PC sequence and every RAM write of a run, compact
+enough to record billions of cycles, and a replayer that seeks to any
+cycle of them.
+
+A trace is a header followed by segments, each starting with a keyframe,
+a snapshot (see snapshot.py) of the machine at that cycle, and holding
+the events of the following cycles. Cycles that neither write RAM nor
+jump are not stored at all; the rest are records of varints:
+
+    (steps << 2) | WRITE | JUMP   cycles since the previous record, this one included
+    zigzag(addr - last addr)      if WRITE, last addr starts at 0 in each segment
+    zigzag(value)                 if WRITE
+    zigzag(target - pc)           if JUMP
+
+A record of no steps marks the machine halting, after the halting jump's
+own record, which leaves the PC on the jump, or on running off the ROM.
+Straight-line code costs nothing and typical records take 2 to 4 bytes.
+Segment layout (little-endian):
+
+    cycle      u64  cycle of the keyframe
+    snapshot   u32  length of the keyframe snapshot
+    events     u32  length of the records
+    snapshot, then records
+
+Segments are written whole, so a recording cut short still replays up to
+its last keyframe.
+"""
+
+import dataclasses
+import os
+import struct
+import typing
+from array import array
+
+from . import snapshot
+from .decode import ADDR_MASK, decode
+from .machine import Machine
+
+MAGIC = b"HTRC"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHxx")
+SEGMENT = struct.Struct("<QII")
+WRITE = 0x1
+JUMP = 0x2
+KEYFRAME_INTERVAL = 1_000_000
+
+
+def zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _varint(out: bytearray, n: int):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class Recorder:
+    """
+    Runs `machine` like Machine.run, writing a trace to `file` with a
+    keyframe every `interval` cycles. RAM changed between calls to run
+    is only picked up by the next keyframe, call keyframe() after poking
+    it to have it in the trace.
+    """
+
+    __slots__ = "machine", "code", "file", "interval", "key", "start", "events", "tail", "last_addr"
+
+    def __init__(self, machine: Machine, file: typing.BinaryIO, interval: int = KEYFRAME_INTERVAL):
+        self.machine = machine
+        # Decoded afresh, the machine's code may hold fused or compiled ops.
+        self.code = decode(machine.rom)
+        self.file = file
+        self.interval = interval
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION))
+        self.key: snapshot.Snapshot | None = None
+        self._begin()
+
+    def _begin(self):
+        self.key = snapshot.take(self.machine, self.key)
+        self.start = self.machine.cycles
+        self.events = bytearray()
+        self.tail = self.last_addr = 0
+
+    def flush(self):
+        "Write the pending segment, which has to be done before closing `file`."
+        if self.tail:
+            # Straight-line cycles after the last record.
+            _varint(self.events, self.tail << 2)
+        data = snapshot.dumps(self.key)
+        self.file.write(SEGMENT.pack(self.start, len(data), len(self.events)))
+        self.file.write(data)
+        self.file.write(self.events)
+
+    def keyframe(self):
+        "Write the pending segment and start the next one at the current cycle."
+        self.flush()
+        self._begin()
+
+    def run(self, max_cycles: int) -> int:
+        "Execute and record at most `max_cycles` instructions, see Machine.run."
+        machine = self.machine
+        executed = 0
+        while executed < max_cycles and not machine.halted:
+            due = self.interval - (machine.cycles - self.start)
+            if due <= 0:
+                self.keyframe()
+                continue
+            steps = self._record(min(due, max_cycles - executed))
+            if not steps:
+                break
+            executed += steps
+        return executed
+
+    def _record(self, max_cycles: int) -> int:
+        machine = self.machine
+        code, ram = self.code, machine.ram
+        a, d, pc = machine.a, machine.d, machine.pc
+        out = self.events
+        put = out.append
+        last_addr = self.last_addr
+        budget = max_cycles
+        last = budget + self.tail
+        halted = False
+        while budget:
+            op = code[pc]
+            budget -= 1
+            if op.__class__ is int:
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                budget += 1
+                if last > budget:
+                    _varint(out, (last - budget) << 2)
+                    last = budget
+                put(0)
+                halted = True
+                break
+            alu, use_m, dest_a, dest_d, dest_m, jump, halt = op
+            addr = a & ADDR_MASK
+            r = alu(d, ram[addr] if use_m else a)
+            taken = jump is not None and jump[(r >= 0) + (r > 0)]
+            if dest_m or taken:
+                n = (last - budget) << 2 | (WRITE if dest_m else 0) | (JUMP if taken else 0)
+                last = budget
+                while n > 0x7F:
+                    put(n & 0x7F | 0x80)
+                    n >>= 7
+                put(n)
+                if dest_m:
+                    ram[addr] = r
+                    _varint(out, zigzag(addr - last_addr))
+                    _varint(out, zigzag(r))
+                    last_addr = addr
+                if taken:
+                    if halt and a == pc - 1:
+                        # The PC stays on the jump, then the halt marker.
+                        put(0)
+                        put(0)
+                        halted = True
+                        break
+                    _varint(out, zigzag(addr - pc))
+                    pc = addr
+                else:
+                    pc += 1
+            else:
+                pc += 1
+            if dest_a:
+                a = r
+            if dest_d:
+                d = r
+        machine.a, machine.d, machine.pc = a, d, pc
+        machine.halted = halted
+        self.last_addr = last_addr
+        self.tail = last - budget
+        executed = max_cycles - budget
+        machine.cycles += executed
+        return executed
+
+
+def records(data: bytes | memoryview) -> typing.Iterator[tuple[int, int | None, int, int | None]]:
+    """
+    Decode a segment's records as (steps, write address, value, jump
+    offset from the jumping instruction), address and offset None when
+    the record has none.
+    """
+    i, end = 0, len(data)
+    last_addr = 0
+
+    def varint() -> int:
+        nonlocal i
+        n = shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            n |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    while i < end:
+        head = varint()
+        addr = offset = None
+        value = 0
+        if head & WRITE:
+            addr = last_addr = last_addr + unzigzag(varint())
+            value = unzigzag(varint())
+        if head & JUMP:
+            offset = unzigzag(varint())
+        yield head >> 2, addr, value, offset
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Segment:
+    cycle: int
+    snapshot: int  # file offset of the keyframe
+    snapshot_size: int
+    events: int  # file offset of the records
+    events_size: int
+
+
+class Replayer:
+    """
+    Reads a trace from `path`, keeping the PC, RAM and cycle count of the
+    traced machine at the cycle last seeked to. A and D are only known at
+    keyframes and are not kept.
+    """
+
+    __slots__ = "file", "segments", "cycle", "pc", "ram", "halted"
+
+    def __init__(self, path: str | os.PathLike):
+        self.file = open(path, "rb")
+        size = self.file.seek(0, os.SEEK_END)
+        head = self._read(0, HEADER.size)
+        if len(head) < HEADER.size:
+            raise Exception("Trace is too short to hold a header")
+        magic, version = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise Exception(f"Not a trace, bad magic {magic!r}")
+        if version != FORMAT_VERSION:
+            raise Exception(f"Unsupported trace format version {version}")
+        self.segments: list[Segment] = []
+        offset = HEADER.size
+        while offset + SEGMENT.size <= size:
+            cycle, snapshot_size, events_size = SEGMENT.unpack(self._read(offset, SEGMENT.size))
+            start = offset + SEGMENT.size
+            offset = start + snapshot_size + events_size
+            if offset > size:
+                break
+            self.segments.append(Segment(cycle, start, snapshot_size, start + snapshot_size, events_size))
+        if not self.segments:
+            raise Exception("Trace holds no complete segment")
+        self.seek(0)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read(self, offset: int, size: int) -> bytes:
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    def _enter(self, segment: Segment):
+        key = snapshot.loads(self._read(segment.snapshot, segment.snapshot_size))
+        self.ram = array("h", b"".join(key.pages))
+        self.pc, self.cycle, self.halted = key.pc, key.cycles, key.halted
+
+    def _find(self, cycle: int) -> int:
+        i = len(self.segments) - 1
+        while i and self.segments[i].cycle > cycle:
+            i -= 1
+        return i
+
+    def seek(self, cycle: int) -> int:
+        """
+        Move to the state after `cycle` instructions, or the end of the
+        trace when it is shorter. Returns the cycle reached, seek(sys.maxsize)
+        finds the end.
+        """
+        for _ in self.steps(cycle, cycle):
+            pass
+        return self.cycle
+
+    def steps(self, start: int = 0, stop: int | None = None) -> typing.Iterator[tuple[int, int, tuple[int, int] | None]]:
+        """
+        Replay cycles `start` up to `stop`, yielding the cycle, PC and RAM
+        write (address, value) or None of every instruction, and leaving
+        the replayer at `stop`.
+        """
+        for segment in self.segments[self._find(start) :]:
+            if stop is not None and segment.cycle > stop:
+                return
+            # Entering every keyframe picks up RAM poked between runs.
+            self._enter(segment)
+            yield from self._replay(segment, stop, start)
+
+    def _replay(self, segment: Segment, stop: int | None, start: int | None = None):
+        """
+        Apply the records of `segment` until `stop`, yielding every
+        instruction from cycle `start` on.
+        """
+        ram = self.ram
+        for steps, addr, value, offset in records(self._read(segment.events, segment.events_size)):
+            cycle, pc = self.cycle, self.pc
+            if not steps:
+                self.halted = True
+                continue
+            partial = stop is not None and cycle + steps > stop
+            if partial:
+                steps = stop - cycle
+                addr = None
+                self.cycle, self.pc = stop, pc + steps
+            else:
+                self.cycle += steps
+                if addr is not None:
+                    ram[addr] = value
+                if offset is None:
+                    self.pc += steps
+                else:
+                    self.pc += steps - 1 + offset
+            if start is not None and start < cycle + steps:
+                for k in range(max(start - cycle, 0), steps):
+                    last = k == steps - 1 and addr is not None
+                    yield cycle + k, pc + k, (addr, value) if last else None
+            if partial:
+                return
@@ -4,4 +4,14 @@ def __getattr__(name: str):
         from .translator import Translator
 
         return Translator
+    if name == "Interpreter":
+        global Interpreter
+        from .interp import Interpreter
+
+        return Interpreter
+    if name == "compile_program":
+        global compile_program
+        from .build import compile_program
+
+        return compile_program
     raise AttributeError(f'Module {__name__} does not export {name!r}')
@@ -1,2 +1,3 @@
+from .build import compile_program
+from .interp import Interpreter
 from .translator import Translator
-
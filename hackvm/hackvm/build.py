@@ -0,0 +1,80 @@
+"""
+VM programs straight to ROM words: the instructions CodeGen emits are
+encoded with hackass's tables and linker, skipping the round trip through
+assembly text. hackass is imported on first use, translating to text does
+not need it (`pip install hackvm[rom]`).
+"""
+
+import functools
+import typing as ty
+from array import array
+
+from .ir import At, Compute, Instruction, Label
+from .translator import Translator
+
+if ty.TYPE_CHECKING:
+    from hackass.linker import Unit
+
+
+@functools.cache
+def c_word(inst: Compute) -> int:
+    from hackass.codes import C_INST, COMP_BITS, DEST_BITS, JUMP_BITS, CompCodes, DestCodes, JumpCodes
+
+    return (
+        C_INST
+        | COMP_BITS[CompCodes[inst.comp.name]]
+        | DEST_BITS[DestCodes[inst.dest.name]]
+        | JUMP_BITS[JumpCodes[inst.jump.name]]
+    )
+
+
+def encode(instructions: ty.Iterable[Instruction], symbols: dict[str, int] | None = None) -> "Unit":
+    """
+    hackass.linker.encode_unit for CodeGen's instructions, sharing its
+    Unit.define and Unit.load, comments are dropped.
+    """
+    from hackass.codes import PREDEFINED
+    from hackass.linker import Unit
+
+    symbols = PREDEFINED if symbols is None else symbols
+    unit = Unit()
+    words, define, load = unit.words, unit.define, unit.load
+    for inst in instructions:
+        match inst:
+            case Compute():
+                words.append(c_word(inst))
+            case At(value=int(value)):
+                if not 0 <= value <= 0x7FFF:
+                    raise Exception(f"Constant {value} cannot fit into 15bits")
+                words.append(value)
+            case At(value=str(symbol)):
+                load(symbol, symbols)
+            case Label(name=name):
+                define(name, symbols)
+    return unit
+
+
+def assemble(
+    instructions: ty.Iterable[Instruction],
+    symbols: dict[str, int] | None = None,
+    *,
+    labels: dict[str, int] | None = None,
+) -> array:
+    """
+    The ROM words of `instructions`, as hackass.assembler.assemble_words
+    gives for their text. labels, when given, is filled with the address
+    of every label.
+    """
+    from hackass.linker import link
+
+    unit = encode(instructions, symbols)
+    if labels is not None:
+        labels.update(unit.labels)
+    return link([unit])
+
+
+def compile_program(
+    trans: Translator, nm: str, program: str, *, labels: dict[str, int] | None = None
+) -> array:
+    "Translate `program` and the functions it uses into ROM words."
+    return assemble(trans.instructions(nm, program), labels=labels)
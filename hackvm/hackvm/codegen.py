@@ -1,6 +1,7 @@
 import dataclasses as dt
 import typing as ty
 
+from .ir import At, Comment, Instruction, Label, c
 from .lexer import Token
 from .parser import Statement
 
@@ -44,6 +45,15 @@ def label_generator(prefix: str, start: int = 0, /):
     return map(lambda i: f"{prefix}{i}", count(start))
 
 
+# Label suffixes of the shared call, return and function entry helpers, and
+# of the label after a function's prologue, `(name)` leading to `(name$body)`.
+# VM identifiers cannot hold a `$`, so no VM label clashes with a body label.
+CALL_SUFFIX = "___CALL"
+RETURN_SUFFIX = "___RETURN"
+FUNCTION_SUFFIX = "___FUNCTION"
+BODY_SUFFIX = "$body"
+
+
 class CodeGen:
     "All state of this class are readonly."
 
@@ -66,54 +76,54 @@ class CodeGen:
 
     def __init__(self, names: Symbols, labgen: ty.Iterable[str]):
         self.names = names
-        self.stack = f"@{names.stack}"
-        self.local = f"@{names.local}"
-        self.argument = f"@{names.argument}"
-        self.free_1 = f"@{names.free_1}"
-        self.free_2 = f"@{names.free_2}"
-        self.free_3 = f"@{names.free_3}"
-        self.static = f"@{names.static}"
+        self.stack = At(names.stack)
+        self.local = At(names.local)
+        self.argument = At(names.argument)
+        self.free_1 = At(names.free_1)
+        self.free_2 = At(names.free_2)
+        self.free_3 = At(names.free_3)
+        self.static = At(names.static)
         self.labgen = iter(labgen)
         self.functions: dict[str, tuple[str, int]] = {}
         self.referenced: dict[str, tuple[str, int]] = {}
         # Mimimize instruction duplication by jumping to this locations
-        self.call_lbl = self.label() + "___CALL"
-        self.return_lbl = self.label() + "___RETURN"
-        self.function_lbl = self.label() + "___FUNCTION"
+        self.call_lbl = self.label() + CALL_SUFFIX
+        self.return_lbl = self.label() + RETURN_SUFFIX
+        self.function_lbl = self.label() + FUNCTION_SUFFIX
 
     def decrement_SP(self):
         yield self.stack
-        yield "M=M-1"
+        yield c("M=M-1")
 
     def increment_SP(self):
         yield self.stack
-        yield "M=M+1"
+        yield c("M=M+1")
 
     def set_A_to_SP0(self):
         yield self.stack
-        yield "A=M"
+        yield c("A=M")
 
     def load_stack_0_into_D(self):
         yield from self.set_A_to_SP0()
-        yield "D=M"
+        yield c("D=M")
 
     def set_A_to_SP1(self):
         yield self.stack
-        yield "A=M-1"
+        yield c("A=M-1")
 
     def load_stack_1_into_D(self):
         yield from self.set_A_to_SP1()
-        yield "D=M"
+        yield c("D=M")
 
     def load_D_into_SP1(self):
         yield self.stack
-        yield "A=M-1"
-        yield "M=D"
+        yield c("A=M-1")
+        yield c("M=D")
 
     def load_D_into_SP0(self):
         yield self.stack
-        yield "A=M"
-        yield "M=D"
+        yield c("A=M")
+        yield c("M=D")
 
     def pop_stack_into_D_and_set_A_to_SP(self):
         """
@@ -129,112 +139,112 @@ class CodeGen:
 
     def binary_arithmetic_cmd(self, op: str):
         yield from self.pop_stack_into_D_and_set_A_to_SP()
-        yield f"M=D{op}M"
+        yield c(f"M=D{op}M")
 
     def unary_not_cmd(self):
         yield from self.set_A_to_SP1()
-        yield "M=!M"
+        yield c("M=!M")
 
     def unary_neg_cmd(self):
         yield from self.unary_not_cmd()
-        yield "M=M+1"
+        yield c("M=M+1")
 
     def label(self) -> str:
         return next(self.labgen)
 
     def comparison_op_cmd(self, jmp: str):
         yield from self.pop_stack_into_D_and_set_A_to_SP()
-        yield f"D=D-M"
-        yield "M=-1"
+        yield c("D=D-M")
+        yield c("M=-1")
         label = self.label()
-        yield f"@{label}"
-        yield f"D;{jmp}"
+        yield At(label)
+        yield c(f"D;{jmp}")
         yield from self.set_A_to_SP1()
-        yield "M=0"
-        yield f"({label})"
+        yield c("M=0")
+        yield Label(label)
 
     @staticmethod
     def set_AD_to_BASE_i(base: str, i: str):
-        yield f"@{base}"
-        yield "D=M"
-        yield f"@{i}"
-        yield "AD=D+A"
+        yield At(base)
+        yield c("D=M")
+        yield At(int(i))
+        yield c("AD=D+A")
 
     def push_cmd(self, segment: str, index: str):
         yield from self.set_AD_to_BASE_i(segment, index)
-        yield "D=M"
+        yield c("D=M")
         yield from self.push_D_into_stack()
 
     def push_at_cmd(self, constant: int):
-        yield f"@{constant}"
-        yield "D=A"
+        yield At(constant)
+        yield c("D=A")
         yield from self.push_D_into_stack()
 
     def pop_cmd(self, segment: str, index: str):
         yield from self.decrement_SP()
         yield from self.set_AD_to_BASE_i(segment, index)
         yield self.free_1
-        yield "M=D"
+        yield c("M=D")
         yield from self.load_stack_0_into_D()
         yield self.free_1
-        yield "A=M"
-        yield "M=D"
+        yield c("A=M")
+        yield c("M=D")
 
     def pop_at_cmd(self, loc: int):
         yield from self.decrement_SP()
         yield from self.load_stack_0_into_D()
-        yield f"@{loc}"
-        yield "M=D"
+        yield At(loc)
+        yield c("M=D")
 
     def section_function_lbl(self):
         "API: free_1=nvars, D=body_addr"
-        yield f"({self.function_lbl})"
+        yield Label(self.function_lbl)
         # Save return_addr into free_3
         yield self.free_3
-        yield "M=D"
+        yield c("M=D")
         # Iterate nvars times while pushing 0's to the stack
         yield self.free_1
-        yield "D=M"
+        yield c("D=M")
         start_nvars_setup = self.label()
-        yield f"({start_nvars_setup})"
+        yield Label(start_nvars_setup)
         end_nvars_setup = self.label()
-        yield f"@{end_nvars_setup}"
-        yield "D;JEQ"
+        yield At(end_nvars_setup)
+        yield c("D;JEQ")
         yield self.stack
-        yield "A=M"
-        yield "M=0"
+        yield c("A=M")
+        yield c("M=0")
         yield self.stack
-        yield "M=M+1"
-        yield "D=D-1"
-        yield f"@{start_nvars_setup}"
-        yield "0;JMP"
-        yield f"({end_nvars_setup})"
+        yield c("M=M+1")
+        yield c("D=D-1")
+        yield At(start_nvars_setup)
+        yield c("0;JMP")
+        yield Label(end_nvars_setup)
         yield self.free_3
-        yield "A=M"
-        yield "0;JMP"
+        yield c("A=M")
+        yield c("0;JMP")
 
     def function_cmd(self, name: str, nvars: str):
-        yield f"({name})"
-        yield f"@{nvars}"
-        yield "D=A"
+        yield Label(name)
+        yield At(int(nvars))
+        yield c("D=A")
         yield self.free_1
-        yield "M=D"
-        body = f"{self.label()}.{name}"
-        yield f"@{body}"
-        yield "D=A"
-        yield f"@{self.function_lbl}"
-        yield "0;JMP"
-        yield f"({body})"
+        yield c("M=D")
+        body = name + BODY_SUFFIX
+        yield At(body)
+        yield c("D=A")
+        yield At(self.function_lbl)
+        yield c("0;JMP")
+        yield Label(body)
 
     def if_goto_cmd(self, goto: str):
         yield from self.decrement_SP()
         yield from self.load_stack_0_into_D()
         label = self.label()
-        yield f"@{label}"
-        yield "D;JEQ"
-        yield f"@{goto}"
-        yield "0;JMP"
-        yield f"({label})"
+        yield At(label)
+        yield c("D;JEQ")
+        yield At(goto)
+        yield c("0;JMP")
+        yield Label(label)
 
     def push_D_into_stack(self):
         yield from self.load_D_into_SP0()
@@ -242,8 +252,8 @@ class CodeGen:
 
     @staticmethod
     def load_from_src_into_D(src: int):
-        yield f"@{src}"
-        yield "D=M"
+        yield At(src)
+        yield c("D=M")
 
     def push_src_into_stack(self, src: int):
         yield from self.load_from_src_into_D(src)
@@ -257,53 +267,53 @@ class CodeGen:
 
     def section_call_lbl(self):
         "API: D=return_address, free_1=function, free_2=nvars"
-        yield f"({self.call_lbl})"
+        yield Label(self.call_lbl)
         yield from self.push_frame()
         # LCL=SP
         yield self.stack
-        yield "D=M"
+        yield c("D=M")
         yield self.local
-        yield "M=D"
+        yield c("M=D")
         # Calculate D=SP-nvars-3
         yield self.stack
-        yield "D=M"
+        yield c("D=M")
         yield self.free_2
-        yield "D=D-M"
-        yield "@3"
-        yield "D=D-A"
+        yield c("D=D-M")
+        yield At(3)
+        yield c("D=D-A")
         # ARG=D
         yield self.argument
-        yield "M=D"
+        yield c("M=D")
         # Jump to function
         yield self.free_1
-        yield "A=M"
-        yield "0;JMP"
+        yield c("A=M")
+        yield c("0;JMP")
 
     def _call_base(self, nvars: str):
         yield self.free_1
-        yield "M=D"
+        yield c("M=D")
 
-        yield f"@{nvars}"
-        yield "D=A"
+        yield At(int(nvars))
+        yield c("D=A")
         yield self.free_2
-        yield "M=D"
+        yield c("M=D")
 
         ret = self.label()
-        yield f"@{ret}"
-        yield "D=A"
-        yield f"@{self.call_lbl}"
-        yield "0;JMP"
-        yield f"({ret})"
+        yield At(ret)
+        yield c("D=A")
+        yield At(self.call_lbl)
+        yield c("0;JMP")
+        yield Label(ret)
 
     def call_cmd(self, function: str, nvars: str):
-        yield f"@{function}"
-        yield "D=A"
+        yield At(function)
+        yield c("D=A")
         yield from self._call_base(nvars)
 
     def pop_stack_into_dest(self, dest: int):
         yield from self.load_stack_1_into_D()
-        yield f"@{dest}"
-        yield "M=D"
+        yield At(dest)
+        yield c("M=D")
         yield from self.decrement_SP()
 
     def pop_frame(self):
@@ -312,58 +322,58 @@ class CodeGen:
         yield from self.pop_stack_into_dest(self.names.local)
         yield from self.load_stack_1_into_D()
         yield self.free_3
-        yield "M=D"
+        yield c("M=D")
 
     def section_return_lbl(self):
-        yield f"({self.return_lbl})"
+        yield Label(self.return_lbl)
         # save the result into free_1
         yield from self.load_stack_1_into_D()
         yield self.free_1
-        yield "M=D"
+        yield c("M=D")
 
         # set ARG into free_2
         yield self.argument
-        yield "D=M"
+        yield c("D=M")
         yield self.free_2
-        yield "M=D"
+        yield c("M=D")
 
         # remove all locals by setting SP to LCL
         yield self.local
-        yield "D=M"
+        yield c("D=M")
         yield self.stack
-        yield "M=D"
+        yield c("M=D")
 
         # set the frame back to callers ctx and return address into free_3
         yield from self.pop_frame()
 
         # set SP=free_2
         yield self.free_2
-        yield "D=M"
+        yield c("D=M")
         yield self.stack
-        yield "M=D"
+        yield c("M=D")
 
         # set RAM[SP]=free_1
         yield self.free_1
-        yield "D=M"
+        yield c("D=M")
         yield from self.push_D_into_stack()
 
         # jump to the return address in free_3
         yield self.free_3
-        yield "A=M"
-        yield "0;JMP"
+        yield c("A=M")
+        yield c("0;JMP")
 
     def return_cmd(self):
-        yield f"@{self.return_lbl}"
-        yield "0;JMP"
+        yield At(self.return_lbl)
+        yield c("0;JMP")
 
     def get_name(self, name: str):
         return getattr(self.names, name)
 
     def program_setup(self):
-        yield from ("@16", "D=A", self.stack, "M=D")
+        yield from (At(16), c("D=A"), self.stack, c("M=D"))
 
     def program_teardown(self):
-        yield "\n\n// VM INSTRUCTION HELPERS: [call, return, function]"
+        yield Comment("\n\n// VM INSTRUCTION HELPERS: [call, return, function]")
         yield from self.section_call_lbl()
         yield from self.section_return_lbl()
         yield from self.section_function_lbl()
@@ -393,8 +403,8 @@ class CodeGen:
     def scoped_push_cmd(self, nm: str, ident: Token):
         if ident.lexeme not in self.functions:
             self.referenced[ident.lexeme] = nm, ident.line
-        yield f"@{ident.lexeme}"
-        yield "D=A"
+        yield At(ident.lexeme)
+        yield c("D=A")
         yield from self.push_D_into_stack()
 
     def scoped_label_cmd(self, nm: str, ident: Token):
@@ -405,42 +415,42 @@ class CodeGen:
                 f"Line {ident.line}: Mangled label ({ident.lexeme!r} -> {mangled!r}) "
                 f"conflits with function {mangled!r} defined in {info[0]} line {info[1]}"
             )
-        yield f"({mangled})"
+        yield Label(mangled)
 
-    def _load_THISpI_into_D(self, index: str, *this: str):
+    def _load_THISpI_into_D(self, index: str, *this: Instruction):
         "AD=RAM[A]+index"
-        yield f"@{index}"
-        yield "D=A"
+        yield At(int(index))
+        yield c("D=A")
         yield from this
-        yield "AD=D+M"
+        yield c("AD=D+M")
 
     def _pop_member(self):
         "API: D=this+I"
         yield self.free_1
-        yield "M=D"
+        yield c("M=D")
         yield from self.load_stack_1_into_D()
         yield self.free_1
-        yield "A=M"
-        yield "M=D"
+        yield c("A=M")
+        yield c("M=D")
         yield from self.decrement_SP()
 
     def pop_member(self, index: str):
         yield from self.decrement_SP()
-        yield from self._load_THISpI_into_D(index, self.stack, "A=M")
+        yield from self._load_THISpI_into_D(index, self.stack, c("A=M"))
         yield from self._pop_member()
 
     def pop_member_this(self, index: str):
-        yield from self._load_THISpI_into_D(index, self.argument, "A=M")
+        yield from self._load_THISpI_into_D(index, self.argument, c("A=M"))
         yield from self._pop_member()
 
     def push_member(self, index: str):
-        yield from self._load_THISpI_into_D(index, self.stack, "A=M-1")
-        yield "D=M"
+        yield from self._load_THISpI_into_D(index, self.stack, c("A=M-1"))
+        yield c("D=M")
         yield from self.load_D_into_SP1()
 
     def push_member_this(self, index: str):
-        yield from self._load_THISpI_into_D(index, self.argument, "A=M")
-        yield "D=M"
+        yield from self._load_THISpI_into_D(index, self.argument, c("A=M"))
+        yield c("D=M")
         yield from self.load_D_into_SP0()
         yield from self.increment_SP()
 
@@ -448,10 +458,10 @@ class CodeGen:
     def mangle_label(nm: str, label: str):
         return f"{nm}.{label}"
 
-    def gen(self, stmts: ty.Iterable[Statement], nm: str) -> ty.Iterator[str]:
+    def gen(self, stmts: ty.Iterable[Statement], nm: str) -> ty.Iterator[Instruction]:
         T = Token.Type
         for stmt in stmts:
-            yield f"\n// {nm}[{stmt[0].line}]   " + " ".join(tk.lexeme for tk in stmt)
+            yield Comment(f"\n// {nm}[{stmt[0].line}]   " + " ".join(tk.lexeme for tk in stmt))
             match stmt:
                 case (Token(typ=T.AND | T.OR | T.ADD | T.SUB),):
                     yield from self.binary_arithmetic_cmd(_bin_op_tbl[stmt[0].typ])
@@ -468,7 +478,7 @@ class CodeGen:
                 case (Token(typ=T.IF_GOTO), ident):
                     yield from self.if_goto_cmd(self.mangle_label(nm, ident.lexeme))
                 case (Token(typ=T.GOTO), ident):
-                    yield from (f"@{self.mangle_label(nm, ident.lexeme)}", f"0;JMP")
+                    yield from (At(self.mangle_label(nm, ident.lexeme)), c("0;JMP"))
                 case (Token(typ=T.RETURN),):
                     yield from self.return_cmd()
                 case (Token(typ=T.CALL), nvars):
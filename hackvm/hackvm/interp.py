@@ -0,0 +1,357 @@
+"""
+A direct interpreter for VM statements: a quick reference executor for
+testing VM code without translating, assembling and emulating it.
+
+Memory is laid out the way CodeGen lays it out, a list of 32K RAM words
+with SP, LCL, ARG and the segments at the Symbols addresses, so the
+stack and segments can be compared with an emulated translation. Calls
+keep Frame objects for where to return to; the words CodeGen would hold
+ROM addresses in differ: return addresses in the frames on the stack are
+statement indices here, `push function` pushes the function's index and
+the free registers are not used at all.
+"""
+
+import dataclasses as dt
+import pathlib
+import typing as ty
+
+from .codegen import Symbols
+from .lexer import Lexer, Token
+from .parser import Parser, Statement
+from .translator import resolve
+
+RAM_SIZE = 0x8000
+ADDR_MASK = 0x7FFF
+# Where CodeGen.program_setup points SP.
+STACK_START = 16
+
+# Operations statements are compiled to, as (op, x, y) tuples.
+PUSH = 0  # push x
+PUSH_SEG = 1  # push RAM[RAM[x] + y]
+POP_SEG = 2  # RAM[RAM[x] + y] = pop
+POP_AT = 3  # RAM[x] = pop
+ADD = 4
+SUB = 5
+AND = 6
+OR = 7
+NEG = 8
+NOT = 9
+EQ = 10
+LT = 11
+GT = 12
+GOTO = 13  # goto x
+IF_GOTO = 14  # goto x if pop != 0
+PUSH_MEMBER = 15  # top = RAM[top + x]
+PUSH_THIS = 16  # push RAM[argument 0 + x]
+POP_MEMBER = 17  # RAM[pop + x] = pop
+POP_THIS = 18  # RAM[argument 0 + x] = pop
+FUNCTION = 19  # push x zeros
+CALL = 20  # call function x with y arguments
+CALL_POP = 21  # call the function popped with y arguments
+RETURN = 22
+LABEL = 23
+HALT = 24  # `label end / goto end`
+
+Op = tuple[int, int, int]
+
+
+def wrap(value: int) -> int:
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+@dt.dataclass(slots=True)
+class Frame:
+    function: str
+    ret: int
+
+
+class Interpreter:
+    """
+    Load a program with load(), which pulls in the functions it references
+    from `paths` like Translator does, then run() it.
+    """
+
+    def __init__(
+        self,
+        paths: ty.Sequence[pathlib.Path] | None = None,
+        *,
+        names: Symbols | None = None,
+    ):
+        self.names = Symbols() if names is None else names
+        self.paths = paths or ()
+        self.reset()
+
+    def reset(self):
+        self.statements: list[tuple[str, Statement]] = []
+        self.labels: dict[str, dict[str, int]] = {}
+        self.functions: dict[str, tuple[str, int]] = {}
+        self.referenced: dict[str, tuple[str, int]] = {}
+        self.not_found = set[str]()
+        self.code: list[Op] = []
+        self.entries: list[int] = []  # statement index of each function, by index
+        self.ram = [0] * RAM_SIZE
+        self.frames: list[Frame] = []
+        self.pc = 0
+        self.steps = 0
+        self.halted = False
+
+    def _load(self, nm: str, program: str):
+        T = Token.Type
+        labels = self.labels.setdefault(nm, {})
+        for stmt in Parser(Lexer(program)):
+            match stmt:
+                case (Token(typ=T.LABEL), ident):
+                    labels[ident.lexeme] = len(self.statements)
+                case (Token(typ=T.FUNCTION), ident, _):
+                    if ident.lexeme in self.functions:
+                        info = self.functions[ident.lexeme]
+                        raise Exception(
+                            f"Line {ident.line}: Function {ident.lexeme!r} has already "
+                            f"been defined in {info[0]!r} line {info[1]}"
+                        )
+                    self.referenced.pop(ident.lexeme, None)
+                    self.functions[ident.lexeme] = nm, ident.line
+                case (Token(typ=T.CALL), ident, _) | (Token(typ=T.PUSH), Token(typ=T.ID) as ident):
+                    if ident.lexeme not in self.functions:
+                        self.referenced[ident.lexeme] = nm, ident.line
+            self.statements.append((nm, stmt))
+
+    def resolve_refs(self):
+        for name in self.referenced:
+            if name in self.not_found:
+                continue
+            if found := resolve(self.paths, name):
+                return name, found
+        return None, None
+
+    def load(self, nm: str, program: str):
+        "Load `program` from the file stem `nm` and everything it references."
+        self.reset()
+        self._load(nm, program)
+        while True:
+            name, found = self.resolve_refs()
+            if found is None:
+                break
+            with open(found) as file:
+                program = file.read()
+            try:
+                self._load(found.stem, program)
+                if name in self.referenced:
+                    self.not_found.add(name)
+            except Exception as e:
+                e.add_note(f"Error encountered while processing: {found!s}")
+                raise
+        if self.referenced:
+            raise Exception(
+                "Unresolved functions\n"
+                + "\n".join(
+                    f"{name} used in {nm} line {line}"
+                    for name, (nm, line) in self.referenced.items()
+                )
+            )
+        self.compile()
+        self.ram[self.names.stack] = STACK_START
+
+    def compile(self):
+        "Turn the loaded statements into operations for run()."
+        T = Token.Type
+        names = self.names
+        index = {name: i for i, name in enumerate(self.functions)}
+        self.entries = [0] * len(index)
+        code: list[Op] = []
+        for pc, (nm, stmt) in enumerate(self.statements):
+            match stmt:
+                case (Token(typ=T.ADD),):
+                    op = ADD, 0, 0
+                case (Token(typ=T.SUB),):
+                    op = SUB, 0, 0
+                case (Token(typ=T.AND),):
+                    op = AND, 0, 0
+                case (Token(typ=T.OR),):
+                    op = OR, 0, 0
+                case (Token(typ=T.NEG),):
+                    op = NEG, 0, 0
+                case (Token(typ=T.NOT),):
+                    op = NOT, 0, 0
+                case (Token(typ=T.EQ),):
+                    op = EQ, 0, 0
+                case (Token(typ=T.LT),):
+                    op = LT, 0, 0
+                case (Token(typ=T.GT),):
+                    op = GT, 0, 0
+                case (Token(typ=T.LABEL), _):
+                    op = LABEL, 0, 0
+                case (Token(typ=T.FUNCTION), ident, nvars):
+                    self.entries[index[ident.lexeme]] = pc
+                    op = FUNCTION, int(nvars.lexeme), 0
+                case (Token(typ=T.IF_GOTO), ident):
+                    op = IF_GOTO, self.labels[nm][ident.lexeme], 0
+                case (Token(typ=T.GOTO), ident):
+                    target = self.labels[nm][ident.lexeme]
+                    spins = target <= pc and all(code[i][0] == LABEL for i in range(target, pc))
+                    op = (HALT, 0, 0) if spins else (GOTO, target, 0)
+                case (Token(typ=T.RETURN),):
+                    op = RETURN, 0, 0
+                case (Token(typ=T.CALL), nvars):
+                    op = CALL_POP, 0, int(nvars.lexeme)
+                case (Token(typ=T.CALL), ident, nvars):
+                    op = CALL, index[ident.lexeme], int(nvars.lexeme)
+                case (Token(typ=T.PUSH), Token(typ=T.ID) as ident):
+                    op = PUSH, index[ident.lexeme], 0
+                case (Token(typ=T.PUSH), Token(typ=T.MEMBER), i):
+                    op = PUSH_MEMBER, int(i.lexeme), 0
+                case (Token(typ=T.PUSH), Token(typ=T.THIS), i):
+                    op = PUSH_THIS, int(i.lexeme), 0
+                case (Token(typ=T.POP), Token(typ=T.MEMBER), i):
+                    op = POP_MEMBER, int(i.lexeme), 0
+                case (Token(typ=T.POP), Token(typ=T.THIS), i):
+                    op = POP_THIS, int(i.lexeme), 0
+                case (Token(typ=T.PUSH), Token(typ=T.STATIC | T.TEMP | T.CONSTANT) as t, i):
+                    # CodeGen.push_at_cmd pushes the address itself.
+                    op = PUSH, wrap(getattr(names, t.lexeme) + int(i.lexeme)), 0
+                case (Token(typ=T.PUSH), Token(typ=T.LOCAL | T.ARGUMENT) as t, i):
+                    op = PUSH_SEG, getattr(names, t.lexeme), int(i.lexeme)
+                case (Token(typ=T.POP), Token(typ=T.STATIC | T.TEMP) as t, i):
+                    op = POP_AT, (getattr(names, t.lexeme) + int(i.lexeme)) & ADDR_MASK, 0
+                case (Token(typ=T.POP), Token(typ=T.ARGUMENT | T.LOCAL) as t, i):
+                    op = POP_SEG, getattr(names, t.lexeme), int(i.lexeme)
+                case _:
+                    raise Exception(
+                        f"Line {stmt[0].line}: Cannot interpret statement {' '.join(map(lambda t: t.lexeme, stmt))!r}"
+                    )
+            code.append(op)
+        self.code = code
+
+    @property
+    def stack(self) -> list[int]:
+        "The words on the stack, bottom first."
+        return self.ram[STACK_START : self.ram[self.names.stack]]
+
+    def run(self, max_steps: int) -> int:
+        """
+        Execute at most `max_steps` statements, stopping early when the
+        program spins on `label end / goto end` or runs off its end.
+        Returns the number of statements executed.
+        """
+        code, ram, frames, entries = self.code, self.ram, self.frames, self.entries
+        S, LCL, ARG = self.names.stack, self.names.local, self.names.argument
+        M = ADDR_MASK
+        functions = list(self.functions)
+        size = len(code)
+        pc = self.pc
+        steps = 0
+        halted = False
+        while steps < max_steps:
+            if pc >= size:
+                halted = True
+                break
+            op, x, y = code[pc]
+            steps += 1
+            pc += 1
+            if op == PUSH:
+                sp = ram[S]
+                ram[sp & M] = x
+                ram[S] = sp + 1
+            elif op == PUSH_SEG:
+                sp = ram[S]
+                ram[sp & M] = ram[(ram[x] + y) & M]
+                ram[S] = sp + 1
+            elif op == POP_SEG:
+                sp = ram[S] - 1
+                ram[S] = sp
+                ram[(ram[x] + y) & M] = ram[sp & M]
+            elif op == POP_AT:
+                sp = ram[S] - 1
+                ram[S] = sp
+                ram[x] = ram[sp & M]
+            elif op <= GT:
+                sp = ram[S] - 1
+                top = ram[sp & M]
+                if op == NEG:
+                    ram[sp & M] = wrap(-top)
+                    continue
+                if op == NOT:
+                    ram[sp & M] = ~top
+                    continue
+                # Binary operations take the top of the stack on the left.
+                ram[S] = sp
+                below = ram[(sp - 1) & M]
+                if op == ADD:
+                    value = wrap(top + below)
+                elif op == SUB:
+                    value = wrap(top - below)
+                elif op == AND:
+                    value = top & below
+                elif op == OR:
+                    value = top | below
+                else:
+                    diff = wrap(top - below)
+                    hit = diff == 0 if op == EQ else diff < 0 if op == LT else diff > 0
+                    value = -1 if hit else 0
+                ram[(sp - 1) & M] = value
+            elif op == GOTO:
+                pc = x
+            elif op == IF_GOTO:
+                sp = ram[S] - 1
+                ram[S] = sp
+                if ram[sp & M]:
+                    pc = x
+            elif op == LABEL:
+                pass
+            elif op == PUSH_MEMBER:
+                sp = ram[S] - 1
+                ram[sp & M] = ram[(ram[sp & M] + x) & M]
+            elif op == PUSH_THIS:
+                sp = ram[S]
+                ram[sp & M] = ram[(ram[ram[ARG] & M] + x) & M]
+                ram[S] = sp + 1
+            elif op == POP_MEMBER:
+                sp = ram[S] - 2
+                ram[S] = sp
+                ram[(ram[(sp + 1) & M] + x) & M] = ram[sp & M]
+            elif op == POP_THIS:
+                sp = ram[S] - 1
+                ram[S] = sp
+                ram[(ram[ram[ARG] & M] + x) & M] = ram[sp & M]
+            elif op == FUNCTION:
+                sp = ram[S]
+                for i in range(sp, sp + x):
+                    ram[i & M] = 0
+                ram[S] = sp + x
+            elif op == CALL or op == CALL_POP:
+                if op == CALL_POP:
+                    sp = ram[S] - 1
+                    ram[S] = sp
+                    x = ram[sp & M]
+                    if not 0 <= x < len(entries):
+                        self.pc, self.halted = pc - 1, False
+                        raise Exception(f"Call to {x}, which is not a function index")
+                sp = ram[S]
+                ram[sp & M] = wrap(pc)
+                ram[(sp + 1) & M] = ram[LCL]
+                ram[(sp + 2) & M] = ram[ARG]
+                sp += 3
+                ram[S] = ram[LCL] = sp
+                ram[ARG] = sp - y - 3
+                frames.append(Frame(functions[x], pc))
+                pc = entries[x]
+            elif op == RETURN:
+                if not frames:
+                    self.pc, self.halted = pc - 1, False
+                    raise Exception("Return without a call to return from")
+                frame = ram[LCL]
+                result = ram[(ram[S] - 1) & M]
+                arg = ram[ARG]
+                ram[ARG] = ram[(frame - 1) & M]
+                ram[LCL] = ram[(frame - 2) & M]
+                ram[arg & M] = result
+                ram[S] = arg + 1
+                pc = frames.pop().ret
+            else:  # HALT
+                pc -= 1
+                halted = True
+                break
+        self.pc = pc
+        self.halted = halted
+        self.steps += steps
+        return steps
@@ -0,0 +1,116 @@
+"""
+The Hack assembly CodeGen emits, as objects instead of text.
+
+str() of an instruction is its line of assembly. hackvm.build encodes
+them with hackass directly, without formatting and parsing text back.
+The enums name their members like hackass.codes so they map one to one.
+"""
+
+import dataclasses as dt
+import enum
+import functools
+
+
+class Dest(enum.StrEnum):
+    NULL = ""
+    M = "M"
+    D = "D"
+    DM = "DM"
+    A = "A"
+    AM = "AM"
+    AD = "AD"
+    ADM = "ADM"
+
+
+class Comp(enum.StrEnum):
+    ZERO = "0"
+    ONE = "1"
+    NEG_ONE = "-1"
+    D = "D"
+    A = "A"
+    M = "M"
+    NOT_D = "!D"
+    NOT_A = "!A"
+    NOT_M = "!M"
+    NEG_D = "-D"
+    NEG_A = "-A"
+    NEG_M = "-M"
+    DpONE = "D+1"
+    ApONE = "A+1"
+    MpONE = "M+1"
+    DmONE = "D-1"
+    AmONE = "A-1"
+    MmONE = "M-1"
+    DpA = "D+A"
+    DpM = "D+M"
+    DmA = "D-A"
+    DmM = "D-M"
+    AmD = "A-D"
+    MmD = "M-D"
+    DaA = "D&A"
+    DaM = "D&M"
+    DoA = "D|A"
+    DoM = "D|M"
+
+
+class Jump(enum.StrEnum):
+    NULL = ""
+    JGT = "JGT"
+    JEQ = "JEQ"
+    JGE = "JGE"
+    JLT = "JLT"
+    JNE = "JNE"
+    JLE = "JLE"
+    JMP = "JMP"
+
+
+@dt.dataclass(slots=True, frozen=True)
+class At:
+    "A-instruction loading a constant or the value of a symbol."
+
+    value: int | str
+
+    def __str__(self):
+        return f"@{self.value}"
+
+
+@dt.dataclass(slots=True, frozen=True)
+class Compute:
+    "C-instruction dest=comp;jump."
+
+    dest: Dest
+    comp: Comp
+    jump: Jump = Jump.NULL
+
+    def __str__(self):
+        text = f"{self.dest}={self.comp}" if self.dest else str(self.comp)
+        return f"{text};{self.jump}" if self.jump else text
+
+
+@dt.dataclass(slots=True, frozen=True)
+class Label:
+    name: str
+
+    def __str__(self):
+        return f"({self.name})"
+
+
+@dt.dataclass(slots=True, frozen=True)
+class Comment:
+    "Text for the .asm output only, comment markers included."
+
+    text: str
+
+    def __str__(self):
+        return self.text
+
+
+type Instruction = At | Compute | Label | Comment
+
+
+@functools.cache
+def c(text: str) -> Compute:
+    "The C-instruction spelled `text`, as in `D=D-M` or `D;JEQ`."
+    dest, _, rest = text.rpartition("=")
+    comp, _, jump = rest.partition(";")
+    return Compute(Dest(dest), Comp(comp), Jump(jump))
@@ -6,16 +6,33 @@ import typing
 from .translator import Translator
 
 PATH_ENV = "HACK_VM_PATHS"
+# Output formats by option, .hack and .rom are assembled without writing .asm.
+FORMATS = {"--asm": ".asm", "--hack": ".hack", "--rom": ".rom"}
 
 
 def _compile(trans: Translator, in_file: pathlib.Path, out_file: pathlib.Path):
     with open(in_file) as f:
         vm_src = f.read()
-    with open(out_file, "w") as f:
-        f.writelines(line + "\n" for line in trans.translate(in_file.stem, vm_src))
+    if out_file.suffix == ".asm":
+        with open(out_file, "w") as f:
+            f.writelines(line + "\n" for line in trans.translate(in_file.stem, vm_src))
+        return
+    from .build import compile_program
 
+    words = compile_program(trans, in_file.stem, vm_src)
+    if out_file.suffix == ".rom":
+        from hackass.rom import dump
 
-def compile_file(in_file: pathlib.Path, paths: typing.Sequence[pathlib.Path]):
+        with open(out_file, "wb") as f:
+            dump(words, f)
+    else:
+        from hackass.assembler import format_words
+
+        with open(out_file, "w") as f:
+            f.write(format_words(words))
+
+
+def compile_file(in_file: pathlib.Path, paths: typing.Sequence[pathlib.Path], suffix: str = ".asm"):
     if not in_file.is_file():
         print(f"{in_file!s} is not a regular file.", file=sys.stderr)
         return 2
@@ -27,7 +44,7 @@ def compile_file(in_file: pathlib.Path, paths: typing.Sequence[pathlib.Path]):
             file=sys.stderr,
         )
         return 3
-    out_file = in_file.with_suffix(".asm")
+    out_file = in_file.with_suffix(suffix)
     if out_file.exists() and not out_file.is_file():
         print(f"{out_file!s} exists and not a file.", file=sys.stderr)
         return 4
@@ -52,20 +69,23 @@ def get_paths(env: str | None = None, curdir: pathlib.Path | None = None):
 
 
 def main(paths_env: str | None = None):
-    if len(sys.argv) != 2:
+    args = sys.argv[1:]
+    suffix = FORMATS[args.pop(0)] if args and args[0] in FORMATS else ".asm"
+    if len(args) != 1:
         print(
-            f"Usage: python -m hackvm Program.vm\n\t-> Program.asm",
+            f"Usage: python -m hackvm [--asm | --hack | --rom] Program.vm\n"
+            f"\t-> Program.asm, or Program.hack / binary Program.rom",
             file=sys.stderr,
         )
         return 1
-    in_file = pathlib.Path(sys.argv[1])
+    in_file = pathlib.Path(args[0])
     if not in_file.exists():
         print(f"{in_file!s} does not exist.")
     paths = get_paths(paths_env, in_file.parent)
     if in_file.is_file():
-        return compile_file(in_file, paths)
+        return compile_file(in_file, paths, suffix)
     else:
         code = 0
         for file in in_file.glob("[A-Z]*.vm"):
-            code |= compile_file(file, paths)
+            code |= compile_file(file, paths, suffix)
         return code
@@ -2,10 +2,23 @@ import pathlib
 import typing as ty
 
 from .codegen import CodeGen, Symbols, label_generator
+from .ir import Instruction
 from .lexer import Lexer
 from .parser import Parser
 
 
+def resolve(paths: ty.Iterable[pathlib.Path], name: str) -> pathlib.Path | None:
+    "The file defining function `name`: `name`.vm in the first of `paths` holding it."
+    filename = f"{name}.vm"
+    for path in paths:
+        if path.is_dir():
+            for file in path.iterdir():
+                if file.name == filename:
+                    return file
+        elif path.is_file() and path.name == filename:
+            return path
+
+
 class Translator:
     def __init__(
         self,
@@ -25,14 +38,7 @@ class Translator:
         self.codegen = CodeGen(self.names, labgen)
 
     def resolve(self, name: str) -> pathlib.Path | None:
-        filename = f"{name}.vm"
-        for path in self.paths:
-            if path.is_dir():
-                for file in path.iterdir():
-                    if file.name == filename:
-                        return file
-            elif path.is_file() and path.name == filename:
-                return path
+        return resolve(self.paths, name)
 
     def resolve_refs(self):
         for name in self.codegen.referenced:
@@ -47,7 +53,12 @@ class Translator:
         parser = Parser(lexer)
         yield from self.codegen.gen(parser, nm)
 
-    def translate(self, nm: str, program: str):
+    def translate(self, nm: str, program: str) -> ty.Iterator[str]:
+        "The assembly text lines of `program` and the functions it uses."
+        return map(str, self.instructions(nm, program))
+
+    def instructions(self, nm: str, program: str) -> ty.Iterator[Instruction]:
+        "translate() before formatting, see hackvm.ir."
         yield from self.codegen.program_setup()
         yield from self._translate(nm, program)
         while True: